@@ -1,4 +1,6 @@
 #!/usr/bin/env python3
+import argparse
+import importlib
 import os
 import sys
 import warnings
@@ -9,102 +11,285 @@ warnings.filterwarnings("ignore", category=UserWarning, module="transformers")
 warnings.filterwarnings("ignore", category=UserWarning, module="pyworld")
 
 # Add scripts directory to path
-sys.path.append('scripts')
+sys.path.append(str(Path(__file__).resolve().parent / 'scripts'))
 
-from extract_audio import AudioExtractor
-from run_stt import SpeechToText
-from run_whisperx_align import WhisperXAlign
-from pt_postprocess import PortuguesePostProcessor
-from mt_translate import MachineTranslator
-from prosody_and_ssml import ProsodySSMLGenerator
+# Pipeline stages in execution order: (name, module, class, label).
+# Stage modules are imported only when the stage actually runs, so e.g. an
+# extract-only run never pays for torch/transformers/librosa imports.
+STAGES = [
+    ("extract", "extract_audio", "AudioExtractor", "🎵 Extracting and cleaning audio..."),
+    ("fingerprint", "fingerprint", "AudioFingerprinter", "🔎 Fingerprinting audio and checking for re-uploads..."),
+    ("stt", "run_stt", "SpeechToText", "🗣️  Running speech-to-text transcription..."),
+    ("align", "run_whisperx_align", "WhisperXAlign", "🎯 Performing word-level alignment..."),
+    ("postprocess", "pt_postprocess", "PortuguesePostProcessor", "📝 Post-processing Portuguese text..."),
+    ("translate", "mt_translate", "MachineTranslator", "🌐 Translating to English..."),
+    ("ssml", "prosody_and_ssml", "ProsodySSMLGenerator", "🎭 Generating prosody and SSML..."),
+]
+STAGE_NAMES = [s[0] for s in STAGES]
+
+# Draft tier: fast models, no alignment and no SSML, same output layout.
+# Refinement re-runs the model stages with the full models in place.
+DRAFT_STAGES = ["extract", "fingerprint", "stt", "postprocess", "translate"]
+REFINE_STAGES = ["stt", "align", "postprocess", "translate", "ssml"]
+TIERED_STAGES = {"stt", "postprocess", "translate"}
+
+# Confidence thresholds for adaptive decoding: (flag, stage, constructor kwarg).
+# Values given on the command line are collected in STAGE_OPTIONS.
+OPTION_FLAGS = [
+    ("--stt-min-logprob", "stt", "min_avg_logprob"),
+    ("--stt-max-no-speech", "stt", "max_no_speech_prob"),
+    ("--mt-min-logprob", "translate", "min_mean_logprob"),
+]
+STAGE_OPTIONS = {}
+
+def load_stage(name):
+    """Import and return the stage class for a stage name"""
+    for stage_name, module, cls, _ in STAGES:
+        if stage_name == name:
+            return getattr(importlib.import_module(module), cls)
+    raise ValueError(f"Unknown stage '{name}'")
+
+def select_stages(stages=None, from_stage=None):
+    """Resolve --stages/--from-stage into an ordered list of stage names"""
+    selected = list(STAGE_NAMES)
+    if from_stage:
+        selected = selected[STAGE_NAMES.index(from_stage):]
+    if stages:
+        wanted = set(stages)
+        selected = [s for s in selected if s in wanted]
+    return selected
 
 def get_video_files(input_dir="input"):
     """Get all video files from input directory"""
     video_extensions = {'.mp4', '.avi', '.mov', '.mkv', '.wmv', '.flv', '.webm'}
     input_path = Path(input_dir)
-    
+
     if not input_path.exists():
         print(f"❌ Input directory '{input_dir}' does not exist")
         return []
-    
+
     video_files = []
     for file_path in input_path.iterdir():
         if file_path.is_file() and file_path.suffix.lower() in video_extensions:
             video_files.append(file_path.name)
-    
+
     return sorted(video_files)
 
-def process_video(video_name):
-    """Process a single video through the entire pipeline"""
-    print(f"\n{'='*60}")
-    print(f"🎬 Processing video: {video_name}")
-    print(f"{'='*60}")
-    
+def run_stage(video_name, name, tier="full"):
+    """Run one stage for one video; returns the stage object, or None on failure"""
     try:
-        # Step 1: Extract audio
-        print("\n🎵 Step 1/6: Extracting and cleaning audio...")
-        audio_extractor = AudioExtractor(video_name)
-        audio_extractor.process()
-        print("✅ Audio extraction completed")
-        
-        # Step 2: Speech-to-text
-        print("\n🗣️  Step 2/6: Running speech-to-text transcription...")
-        stt = SpeechToText(video_name)
-        stt.process()
-        print("✅ Speech-to-text completed")
-        
-        # Step 3: Word alignment
-        print("\n🎯 Step 3/6: Performing word-level alignment...")
-        aligner = WhisperXAlign(video_name)
-        aligner.process()
-        print("✅ Word alignment completed")
-        
-        # Step 4: Portuguese post-processing
-        print("\n📝 Step 4/6: Post-processing Portuguese text...")
-        postprocessor = PortuguesePostProcessor(video_name)
-        postprocessor.process()
-        print("✅ Portuguese post-processing completed")
-        
-        # Step 5: Machine translation
-        print("\n🌐 Step 5/6: Translating to English...")
-        translator = MachineTranslator(video_name)
-        translator.process()
-        print("✅ Machine translation completed")
-        
-        # Step 6: Prosody and SSML generation
-        print("\n🎭 Step 6/6: Generating prosody and SSML...")
-        ssml_generator = ProsodySSMLGenerator(video_name)
-        ssml_generator.process()
-        print("✅ Prosody and SSML generation completed")
-        
-        print(f"\n🎉 Successfully processed: {video_name}")
-        
+        cls = load_stage(name)
+        kwargs = dict(STAGE_OPTIONS.get(name, {}))
+        if name in TIERED_STAGES:
+            kwargs["tier"] = tier
+        stage = cls(video_name, **kwargs)
+        stage.process()
+        return stage
     except Exception as e:
-        print(f"\n❌ Error processing {video_name}: {str(e)}")
+        print(f"\n❌ Error in stage '{name}' for {video_name}: {str(e)}")
         import traceback
         traceback.print_exc()
+        return None
+
+def process_video(video_name, stages=None, tier="full"):
+    """Process a single video through the selected pipeline stages.
+
+    Returns True on success, False on error, or "reused" when the outputs were
+    copied from an earlier upload of the same audio.
+    """
+    stages = stages or STAGE_NAMES
+    labels = {s[0]: s[3] for s in STAGES}
+
+    print(f"\n{'='*60}")
+    print(f"🎬 Processing video: {video_name}" + (f" [{tier}]" if tier != "full" else ""))
+    print(f"{'='*60}")
+
+    for i, name in enumerate(stages, 1):
+        print(f"\nStep {i}/{len(stages)} [{name}]: {labels[name]}")
+        stage = run_stage(video_name, name, tier)
+        if stage is None:
+            print(f"\n❌ Error processing {video_name}")
+            return False
+        print(f"✅ {name} completed")
+        if getattr(stage, "reused", False):
+            print("♻️  Re-upload of an already processed video: reused its outputs, skipping remaining stages")
+            return "reused"
+
+    print(f"\n🎉 Successfully processed: {video_name}")
+    return True
+
+def spawn_refinement(video_files):
+    """Start the full-model refinement of draft outputs as a detached background process"""
+    import subprocess
+    os.makedirs("logs", exist_ok=True)
+    log_path = Path("logs") / "refine.log"
+    cmd = [sys.executable, str(Path(__file__).resolve()), "--refine"]
+    for v in video_files:
+        cmd += ["--video", v]
+    for flag, stage, kwarg in OPTION_FLAGS:
+        if kwarg in STAGE_OPTIONS.get(stage, {}):
+            cmd += [flag, str(STAGE_OPTIONS[stage][kwarg])]
+    with open(log_path, "a", encoding="utf-8") as log:
+        proc = subprocess.Popen(cmd, stdout=log, stderr=subprocess.STDOUT,
+                                stdin=subprocess.DEVNULL, start_new_session=True)
+    print(f"🔁 Background refinement started (pid {proc.pid}), log: {log_path}")
+
+def refine_videos(video_files):
+    """Replace draft artifacts in place with full-model outputs and report what changed"""
+    from draft_refine import snapshot_draft, write_refine_diff
+    for video_name in video_files:
+        has_draft = snapshot_draft(video_name)
+        if process_video(video_name, REFINE_STAGES) and has_draft:
+            write_refine_diff(video_name)
+
+def update_glossary(video_files):
+    """Patch processed outputs after a glossary edit, re-translating only affected segments"""
+    from glossary_impact import GlossaryUpdater
+    for video_name in video_files:
+        print(f"\n📖 Glossary update: {video_name}")
+        updater = GlossaryUpdater(video_name)
+        updater.process()
+        if updater.needs_full:
+            process_video(video_name, ["postprocess", "translate", "ssml"])
+
+def show_queue_status():
+    """Print queue depth and recent jobs of the watch daemon"""
+    from job_queue import JobQueue
+    queue = JobQueue()
+    status = queue.status(limit=20)
+    queue.close()
+    counts = status["counts"]
+    print(f"📊 Queue depth: {status['depth']} | " + " | ".join(f"{k}: {v}" for k, v in counts.items()))
+    for job in status["jobs"]:
+        err = f" ({job['error'][:80]})" if job["error"] else ""
+        print(f"  #{job['id']:<5} {job['status']:<8} attempts={job['attempts']} {job['video']}{err}")
+
+def run_watch(stages, poll_interval):
+    """Daemon mode: queue videos dropped in input/ and process them as they arrive"""
+    from watch_daemon import WatchDaemon
+    print("🎬 Video Translation Pipeline (watch mode)")
+    print(f"🧩 Stages: {' → '.join(stages)}")
+    WatchDaemon(lambda video: process_video(video, stages), poll_interval=poll_interval).run()
+
+def run_worker(stages, node_id=None, lease_ttl=120.0, poll_interval=5.0, exit_when_idle=False):
+    """Distributed mode: claim (video, stage) leases on shared work/ and process them"""
+    from leases import LeaseManager
+    from distributed_worker import DistributedWorker
+    manager = LeaseManager(node_id=node_id, ttl=lease_ttl)
+    worker = DistributedWorker(run_stage, get_video_files, stages, manager, poll_interval)
+    worker.run(exit_when_idle=exit_when_idle)
+
+def parse_args(argv=None):
+    ap = argparse.ArgumentParser(description="Video Translation Pipeline (PT → EN)")
+    ap.add_argument("--video", action="append",
+                    help="video file name inside input/ (repeatable; default: all videos)")
+    ap.add_argument("--stages", type=lambda s: [x.strip() for x in s.split(",") if x.strip()],
+                    help=f"comma-separated stages to run, from: {','.join(STAGE_NAMES)}")
+    ap.add_argument("--from-stage", choices=STAGE_NAMES,
+                    help="resume from this stage (earlier outputs must already exist in work/)")
+    ap.add_argument("--list", action="store_true", help="list videos in input/ and exit")
+    ap.add_argument("--tier", choices=["full", "draft"], default="full",
+                    help="draft: small Whisper, greedy, no alignment, Opus-MT; refined in the background")
+    ap.add_argument("--no-refine", action="store_true",
+                    help="with --tier draft, do not start the background refinement")
+    ap.add_argument("--refine", action="store_true",
+                    help="re-run the full models over existing draft outputs and write a diff report")
+    ap.add_argument("--glossary-update", action="store_true",
+                    help="after editing glossary/terms.csv, re-translate only the segments it affects")
+    ap.add_argument("--watch", action="store_true",
+                    help="daemon mode: watch input/ and process new videos with models kept loaded")
+    ap.add_argument("--poll-interval", type=float, default=5.0,
+                    help="seconds between input/ scans in --watch/--worker mode")
+    ap.add_argument("--queue-status", action="store_true",
+                    help="print the --watch job queue (depth and per-job status) and exit")
+    ap.add_argument("--worker", action="store_true",
+                    help="distributed mode: claim (video, stage) work via lease files in work/leases")
+    ap.add_argument("--node-id", help="worker identity in lease files (default: hostname-pid)")
+    ap.add_argument("--lease-ttl", type=float, default=120.0,
+                    help="seconds without heartbeat after which a lease is reclaimed")
+    ap.add_argument("--exit-when-idle", action="store_true",
+                    help="in --worker mode, exit once every video has finished all stages")
+    ap.add_argument("--stt-min-logprob", type=float,
+                    help="re-decode STT segments with beam search below this avg log-prob (default -0.8)")
+    ap.add_argument("--stt-max-no-speech", type=float,
+                    help="re-decode STT segments with beam search above this no-speech prob (default 0.6)")
+    ap.add_argument("--mt-min-logprob", type=float,
+                    help="re-translate segments with beam search below this mean token log-prob (default -1.0)")
+    args = ap.parse_args(argv)
+    if args.stages:
+        unknown = [s for s in args.stages if s not in STAGE_NAMES]
+        if unknown:
+            ap.error(f"unknown stage(s): {', '.join(unknown)} (choose from {','.join(STAGE_NAMES)})")
+    return args
+
+def main(argv=None):
+    """Main function to process videos in input directory"""
+    args = parse_args(argv)
+    for flag, stage, kwarg in OPTION_FLAGS:
+        value = getattr(args, flag[2:].replace("-", "_"))
+        if value is not None:
+            STAGE_OPTIONS.setdefault(stage, {})[kwarg] = value
+
+    if args.queue_status:
+        show_queue_status()
+        return
+    if args.watch:
+        run_watch(select_stages(args.stages, args.from_stage), args.poll_interval)
+        return
+    if args.worker:
+        run_worker(select_stages(args.stages, args.from_stage), args.node_id,
+                   args.lease_ttl, args.poll_interval, args.exit_when_idle)
+        return
 
-def main():
-    """Main function to process all videos in input directory"""
     print("🎬 Video Translation Pipeline")
     print("=" * 40)
-    
+
     # Get all video files
     video_files = get_video_files()
-    
+    if args.video:
+        missing = [v for v in args.video if v not in video_files]
+        for v in missing:
+            print(f"❌ Video '{v}' not found in 'input' directory")
+        video_files = [v for v in args.video if v in video_files]
+
     if not video_files:
         print("❌ No video files found in 'input' directory")
         print("📁 Supported formats: .mp4, .avi, .mov, .mkv, .wmv, .flv, .webm")
         return
-    
+
     print(f"📂 Found {len(video_files)} video file(s):")
     for i, video in enumerate(video_files, 1):
         print(f"  {i}. {video}")
-    
+    if args.list:
+        return
+
+    if args.refine:
+        refine_videos(video_files)
+        print("🎉 Refinement done!")
+        return
+    if args.glossary_update:
+        update_glossary(video_files)
+        print("🎉 Glossary update done!")
+        return
+
+    stages = select_stages(args.stages, args.from_stage)
+    if args.tier == "draft":
+        stages = [s for s in stages if s in DRAFT_STAGES]
+    if not stages:
+        print("❌ No stages selected")
+        return
+    print(f"🧩 Stages: {' → '.join(stages)}" + (" [draft]" if args.tier == "draft" else ""))
+
     # Process each video
+    drafted = []
     for video_name in video_files:
-        process_video(video_name)
-    
+        result = process_video(video_name, stages, args.tier)
+        if args.tier == "draft" and result is True:
+            drafted.append(video_name)
+
+    if drafted and not args.no_refine:
+        spawn_refinement(drafted)
+
     print(f"\n🏁 Pipeline completed for all {len(video_files)} video(s)")
     print("🎉 All done!")
 
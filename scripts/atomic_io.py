@@ -0,0 +1,40 @@
+"""Atomic file writes: write to a temp file next to the target, then rename.
+
+Readers (and other nodes on shared storage) see either the previous complete
+file or the new complete file, never a half-written one. The temp name
+includes host and pid so concurrent writers never share a temp file.
+"""
+import os, socket
+from contextlib import contextmanager
+from pathlib import Path
+
+
+def temp_path_for(path):
+    path = Path(path)
+    return path.with_name(f".{path.name}.{socket.gethostname()}.{os.getpid()}.tmp")
+
+
+@contextmanager
+def atomic_path(path):
+    """Yield a temp path to write to (e.g. by ffmpeg); renamed over ``path`` on success."""
+    path = Path(path)
+    path.parent.mkdir(parents=True, exist_ok=True)
+    tmp = temp_path_for(path)
+    try:
+        yield tmp
+        os.replace(tmp, path)
+    except BaseException:
+        tmp.unlink(missing_ok=True)
+        raise
+
+
+@contextmanager
+def atomic_open(path, mode="w", encoding="utf-8", **kwargs):
+    """Like ``open(path, mode)`` for writing, but the file appears atomically on close."""
+    if "b" in mode:
+        encoding = None
+    with atomic_path(path) as tmp:
+        with open(tmp, mode, encoding=encoding, **kwargs) as f:
+            yield f
+            f.flush()
+            os.fsync(f.fileno())
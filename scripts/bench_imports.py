@@ -0,0 +1,97 @@
+#!/usr/bin/env python3
+"""Cold-startup import-time benchmark for the CLI.
+
+Runs ``python -X importtime`` in fresh interpreters for a given stage
+selection and sums the self time of every imported module. Fails (exit 1)
+when the best run is over budget or when a heavy ML dependency gets imported
+on a path that must not need it.
+
+    python scripts/bench_imports.py                      # extract-only path
+    python scripts/bench_imports.py --stages extract,stt --budget-ms 400
+"""
+import argparse, json, os, subprocess, sys
+from pathlib import Path
+
+ROOT = Path(__file__).resolve().parent.parent
+
+# Modules that only the model-backed stages may pull in.
+HEAVY_MODULES = ["torch", "transformers", "langid", "librosa", "pyworld",
+                 "whisperx", "faster_whisper", "deepmultilingualpunctuation"]
+
+
+def parse_importtime(stderr):
+    """Return {module: (self_us, cumulative_us)} from -X importtime output."""
+    modules = {}
+    for line in stderr.splitlines():
+        if not line.startswith("import time:") or "[us]" in line:
+            continue
+        try:
+            _, rest = line.split(":", 1)
+            self_us, cum_us, name = rest.split("|", 2)
+            modules[name.strip()] = (int(self_us), int(cum_us))
+        except ValueError:
+            continue
+    return modules
+
+
+def measure(stages, python=sys.executable):
+    code = ("import main\n"
+            f"for s in {stages!r}:\n"
+            "    main.load_stage(s)\n")
+    proc = subprocess.run(
+        [python, "-X", "importtime", "-c", code],
+        cwd=ROOT, capture_output=True, text=True,
+        env={**os.environ, "PYTHONDONTWRITEBYTECODE": "1"},
+    )
+    if proc.returncode != 0:
+        raise RuntimeError(f"import failed:\n{proc.stderr[-2000:]}")
+    modules = parse_importtime(proc.stderr)
+    total_ms = sum(s for s, _ in modules.values()) / 1000.0
+    return total_ms, modules
+
+
+def main():
+    ap = argparse.ArgumentParser(description="CLI cold-startup import-time budget check")
+    ap.add_argument("--stages", default="extract", help="comma-separated stages to import")
+    ap.add_argument("--budget-ms", type=float, default=300.0)
+    ap.add_argument("--runs", type=int, default=5, help="best of N fresh interpreters")
+    ap.add_argument("--top", type=int, default=10, help="show the N slowest modules")
+    ap.add_argument("--report", default="logs/import_time_report.json")
+    args = ap.parse_args()
+
+    stages = [s.strip() for s in args.stages.split(",") if s.strip()]
+    runs = [measure(stages) for _ in range(max(1, args.runs))]
+    best_ms, modules = min(runs, key=lambda r: r[0])
+
+    heavy = sorted({m.split(".")[0] for m in modules} & set(HEAVY_MODULES))
+    slowest = sorted(modules.items(), key=lambda kv: kv[1][0], reverse=True)[:args.top]
+
+    print(f"⏱️  Import time for stages [{', '.join(stages)}]: {best_ms:.1f} ms "
+          f"(best of {len(runs)}, budget {args.budget_ms:.0f} ms)")
+    for name, (self_us, cum_us) in slowest:
+        print(f"  {self_us/1000:>8.2f} ms  {name}")
+
+    report_path = ROOT / args.report
+    os.makedirs(report_path.parent, exist_ok=True)
+    json.dump({
+        "stages": stages, "best_ms": round(best_ms, 2), "budget_ms": args.budget_ms,
+        "runs_ms": [round(r[0], 2) for r in runs], "heavy_modules": heavy,
+        "slowest": [{"module": n, "self_ms": s / 1000, "cumulative_ms": c / 1000}
+                    for n, (s, c) in slowest],
+    }, open(report_path, "w", encoding="utf-8"), ensure_ascii=False, indent=2)
+
+    failed = False
+    if best_ms > args.budget_ms:
+        print(f"❌ Import time {best_ms:.1f} ms exceeds budget {args.budget_ms:.0f} ms")
+        failed = True
+    model_stages = {"stt", "align", "postprocess", "translate", "ssml"}
+    if heavy and not set(stages) & model_stages:
+        print(f"❌ Heavy modules imported on a model-free path: {', '.join(heavy)}")
+        failed = True
+    if failed:
+        sys.exit(1)
+    print("✅ Startup within budget")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,158 @@
+#!/usr/bin/env python3
+"""Multi-node worker check on a single machine.
+
+Starts N ``DistributedWorker`` processes (separate node ids) against one
+temporary lease directory with a stub ``run_stage`` that just sleeps, kills
+some of them with SIGKILL mid-run, and checks that every (video, stage)
+ends up ``.done`` exactly once: no unit missing, no unit completed by two
+nodes. Units held by killed workers must be reclaimed after ``--ttl``.
+
+    python scripts/bench_workers.py
+    python scripts/bench_workers.py --workers 6 --kill 3 --videos 10 --ttl 0.5
+"""
+import argparse, json, multiprocessing, os, random, shutil, signal, sys, tempfile, time
+from pathlib import Path
+
+sys.path.insert(0, str(Path(__file__).resolve().parent))
+
+from distributed_worker import DistributedWorker
+from leases import LeaseManager
+
+ROOT = Path(__file__).resolve().parent.parent
+
+
+def _log(path, **entry):
+    # O_APPEND writes of one short line are atomic across processes
+    with open(path, "a", encoding="utf-8") as f:
+        f.write(json.dumps(entry) + "\n")
+
+
+class _Done:
+    reused = False
+
+
+class LoggingLeaseManager(LeaseManager):
+    """Records every mark_done so double completions can be detected."""
+
+    def __init__(self, log_path, **kwargs):
+        super().__init__(**kwargs)
+        self.log_path = log_path
+
+    def mark_done(self, video, stage, **info):
+        super().mark_done(video, stage, **info)
+        _log(self.log_path, event="done", node=self.node_id, video=video, stage=stage)
+
+
+def worker_main(tmp, node_id, videos, stages, ttl, stage_seconds, seed):
+    rnd = random.Random(seed)
+    log_path = os.path.join(tmp, "events.jsonl")
+
+    def run_stage(video, stage):
+        _log(log_path, event="start", node=node_id, video=video, stage=stage)
+        time.sleep(stage_seconds * rnd.uniform(0.5, 1.5))
+        return _Done()
+
+    manager = LoggingLeaseManager(log_path, root=os.path.join(tmp, "leases"), node_id=node_id, ttl=ttl)
+    DistributedWorker(run_stage, lambda: videos, stages, manager, poll_interval=ttl / 4).run(exit_when_idle=True)
+
+
+def run(n_workers, n_kill, n_videos, n_stages, ttl, stage_seconds, timeout, seed):
+    rnd = random.Random(seed)
+    videos = [f"video{i:03d}.mp4" for i in range(n_videos)]
+    stages = [f"stage{j}" for j in range(n_stages)]
+    tmp = tempfile.mkdtemp(prefix="bench_workers_")
+    ctx = multiprocessing.get_context("fork")
+    procs = {}
+    try:
+        for k in range(n_workers):
+            node = f"w{k}"
+            procs[node] = ctx.Process(target=worker_main,
+                                      args=(tmp, node, videos, stages, ttl, stage_seconds, seed + k))
+            procs[node].start()
+
+        # kill some workers at random points while they hold leases
+        total_work = n_videos * n_stages * stage_seconds / n_workers
+        kills = sorted(rnd.uniform(0.1, 0.6) * total_work for _ in range(n_kill))
+        t0, killed = time.perf_counter(), []
+        for at in kills:
+            time.sleep(max(0.0, at - (time.perf_counter() - t0)))
+            alive = [n for n, p in procs.items() if p.is_alive() and n not in killed]
+            if len(alive) <= 1:
+                break
+            victim = rnd.choice(alive)
+            os.kill(procs[victim].pid, signal.SIGKILL)
+            killed.append(victim)
+            print(f"💥 killed {victim} at {time.perf_counter() - t0:.2f}s")
+
+        deadline = time.perf_counter() + timeout
+        for p in procs.values():
+            p.join(max(0.0, deadline - time.perf_counter()))
+        hung = [n for n, p in procs.items() if p.is_alive()]
+        for n in hung:
+            procs[n].kill()
+        elapsed = time.perf_counter() - t0
+
+        events = [json.loads(l) for l in open(os.path.join(tmp, "events.jsonl"), encoding="utf-8")]
+        done_count, start_count = {}, {}
+        for e in events:
+            target = done_count if e["event"] == "done" else start_count
+            key = (e["video"], e["stage"])
+            target[key] = target.get(key, 0) + 1
+        leases = Path(tmp) / "leases"
+        units = [(v, s) for v in videos for s in stages]
+        missing = [f"{v}:{s}" for v, s in units
+                   if not (leases / f"{Path(v).stem}.{s}.done").exists()]
+        duplicated = [f"{v}:{s} x{done_count[(v, s)]}" for v, s in units if done_count.get((v, s), 0) > 1]
+        return {
+            "workers": n_workers, "killed": killed, "hung": hung, "videos": n_videos,
+            "stages": n_stages, "units": len(units), "ttl": ttl, "elapsed_s": round(elapsed, 2),
+            "stage_runs": sum(start_count.values()),
+            "rerun_after_kill": sum(start_count.values()) - len(units),
+            "missing": missing, "duplicated": duplicated,
+            # a worker killed between mark_done and release leaves a (harmless) lease
+            "leftover_leases": sorted(p.name for p in leases.glob("*.lease*")),
+        }
+    finally:
+        for p in procs.values():
+            if p.is_alive():
+                p.kill()
+        shutil.rmtree(tmp, ignore_errors=True)
+
+
+def main():
+    ap = argparse.ArgumentParser(description="Single-machine check of lease-based multi-node workers")
+    ap.add_argument("--workers", type=int, default=3)
+    ap.add_argument("--kill", type=int, default=1, help="workers to SIGKILL while running")
+    ap.add_argument("--videos", type=int, default=6)
+    ap.add_argument("--stages", type=int, default=3)
+    ap.add_argument("--ttl", type=float, default=1.0, help="lease ttl in seconds")
+    ap.add_argument("--stage-seconds", type=float, default=0.2, help="mean stub stage duration")
+    ap.add_argument("--timeout", type=float, default=120.0)
+    ap.add_argument("--seed", type=int, default=0)
+    ap.add_argument("--report", default="logs/bench_workers_report.json")
+    args = ap.parse_args()
+    if args.kill >= args.workers:
+        ap.error("--kill must be smaller than --workers (someone has to finish the work)")
+
+    report = run(args.workers, args.kill, args.videos, args.stages, args.ttl,
+                 args.stage_seconds, args.timeout, args.seed)
+
+    print(f"⏱️  {report['units']} units on {report['workers']} workers in {report['elapsed_s']}s | "
+          f"killed {len(report['killed'])} | {report['rerun_after_kill']} stage run(s) repeated after kills")
+    report_path = ROOT / args.report
+    os.makedirs(report_path.parent, exist_ok=True)
+    json.dump(report, open(report_path, "w", encoding="utf-8"), ensure_ascii=False, indent=2)
+
+    failed = False
+    for key, msg in (("missing", "units never marked done"), ("duplicated", "units completed more than once"),
+                     ("hung", "workers still running at timeout")):
+        if report[key]:
+            print(f"❌ {msg}: {', '.join(report[key][:10])}")
+            failed = True
+    if failed:
+        sys.exit(1)
+    print("✅ Every (video, stage) done exactly once")
+
+
+if __name__ == "__main__":
+    main()
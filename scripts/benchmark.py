@@ -0,0 +1,312 @@
+#!/usr/bin/env python3
+"""Offline throughput/memory benchmark for the pipeline stages.
+
+Generates synthetic media locally (ffmpeg lavfi tone + noise video) and
+synthetic word-aligned transcripts, then runs the real stage classes with
+stub models so nothing needs the network or a GPU.
+
+    python scripts/benchmark.py --durations 60,600,3600
+    python scripts/benchmark.py --durations 60,10800 --thresholds bench_thresholds.json
+
+Thresholds file (JSON), every key optional:
+
+    {
+      "max_scaling": 1.5,
+      "stages": {
+        "extract": {"min_x_realtime": 50, "max_peak_mb": 64},
+        "translate": {"min_x_realtime": 200}
+      }
+    }
+
+``max_scaling`` bounds (seconds per input minute at the largest size) /
+(seconds per input minute at the smallest size) for every stage, i.e. it
+fails when a stage stops scaling linearly. Exit code is 1 on any violation.
+
+Each stage runs twice: once untraced for the wall clock, once in a forked
+child for memory. ``peak_mb`` is the child's peak RSS above its RSS at fork
+time, or the peak RSS of its own subprocesses (ffmpeg) if that is larger, so
+native buffers (libsndfile, pyworld) and ffmpeg are counted.
+"""
+import argparse, json, multiprocessing, os, random, resource, shutil, sys, tempfile, time
+from pathlib import Path
+
+import ffmpeg
+
+sys.path.insert(0, str(Path(__file__).resolve().parent))
+
+from segment_store import SegmentReader, write_segments
+
+STAGES = ["extract", "postprocess", "translate", "ssml", "srt"]
+
+# Small PT vocabulary with the things the post-processor and MT care about:
+# units, numbers, acronyms.
+PT_VOCAB = [
+    "o", "servidor", "de", "rede", "usa", "uma", "VPC", "com", "sub-rede", "pública",
+    "e", "o", "tráfego", "passa", "pelo", "NAT", "na", "porta", "443", "gigabytes",
+    "de", "memória", "em", "cada", "instância", "EC2", "a", "latência", "é", "baixa",
+]
+EN_STUB = {
+    "o": "the", "servidor": "server", "de": "of", "rede": "network", "usa": "uses",
+    "uma": "a", "com": "with", "sub-rede": "subnet", "pública": "public", "e": "and",
+    "tráfego": "traffic", "passa": "goes", "pelo": "through", "na": "on", "porta": "port",
+    "memória": "memory", "em": "in", "cada": "each", "instância": "instance",
+    "a": "the", "latência": "latency", "é": "is", "baixa": "low",
+}
+
+
+def make_synthetic_video(path, duration):
+    """Tone gated on/off (speech-like bursts) mixed with pink noise over a tiny black video."""
+    video = ffmpeg.input(f"color=c=black:s=160x120:r=5:d={duration}", f="lavfi")
+    tone = ffmpeg.input(
+        f"aevalsrc='0.3*sin(2*PI*220*t)*gt(mod(t,10),4)':s=16000:d={duration}", f="lavfi"
+    )
+    noise = ffmpeg.input(f"anoisesrc=d={duration}:c=pink:a=0.02:r=16000", f="lavfi")
+    audio = ffmpeg.filter([tone, noise], "amix", inputs=2)
+    (
+        ffmpeg
+        .output(video, audio, str(path), vcodec="libx264", preset="ultrafast", acodec="aac")
+        .overwrite_output()
+        .run(quiet=True)
+    )
+
+
+def make_synthetic_transcript(duration, seed=0):
+    """Segments of ~4 s with word timings and small inter-word gaps."""
+    rnd = random.Random(seed)
+    segments = []
+    t = 0.0
+    while t < duration - 1.0:
+        seg_start = t
+        words = []
+        for _ in range(rnd.randint(6, 14)):
+            w_start = t
+            w_end = min(duration, w_start + rnd.uniform(0.18, 0.45))
+            words.append({"word": rnd.choice(PT_VOCAB), "start": round(w_start, 3),
+                          "end": round(w_end, 3), "score": round(rnd.uniform(0.6, 1.0), 3)})
+            t = w_end + rnd.choice([0.02, 0.05, 0.1, 0.2, 0.4])
+            if t >= duration - 0.5:
+                break
+        segments.append({
+            "start": round(seg_start, 3), "end": words[-1]["end"],
+            "text": " ".join(w["word"] for w in words),
+            "avg_logprob": -0.2, "no_speech_prob": 0.01, "words": words,
+        })
+        t += rnd.uniform(0.3, 1.2)
+    return {"language": "pt", "duration": duration, "model": "synthetic", "segments": segments}
+
+
+def _maxrss_mb(who):
+    # ru_maxrss is in KiB on Linux, bytes on macOS
+    scale = 1 if sys.platform == "darwin" else 1024
+    return resource.getrusage(who).ru_maxrss * scale / 2**20
+
+
+def _measure_memory(fn, conn):
+    """Forked child: run ``fn`` and send back the peak memory it added, in MB."""
+    try:
+        base = _maxrss_mb(resource.RUSAGE_SELF)
+        fn()
+        conn.send(max(_maxrss_mb(resource.RUSAGE_SELF) - base, _maxrss_mb(resource.RUSAGE_CHILDREN)))
+    finally:
+        conn.close()
+
+
+class BenchmarkStage:
+    """Runs one stage untraced under a wall clock, then again in a child process for peak RSS."""
+
+    def __init__(self, name, fn):
+        self.name = name
+        self.fn = fn
+
+    def peak_mb(self):
+        ctx = multiprocessing.get_context("fork")
+        recv, send = ctx.Pipe(duplex=False)
+        proc = ctx.Process(target=_measure_memory, args=(self.fn, send))
+        proc.start()
+        send.close()
+        try:
+            peak = recv.recv()
+        except EOFError:
+            peak = None
+        proc.join()
+        if proc.exitcode != 0 or peak is None:
+            raise RuntimeError(f"memory pass of stage '{self.name}' failed (exit code {proc.exitcode})")
+        return peak
+
+    def run(self, duration):
+        t0 = time.perf_counter()
+        self.fn()
+        seconds = time.perf_counter() - t0
+        peak = self.peak_mb()
+        return {
+            "stage": self.name,
+            "input_seconds": duration,
+            "seconds": round(seconds, 4),
+            "x_realtime": round(duration / max(seconds, 1e-9), 2),
+            "sec_per_input_min": round(seconds / (duration / 60.0), 5),
+            "peak_mb": round(peak, 2),
+        }
+
+
+class PipelineBenchmark:
+    def __init__(self, durations, stages=None, keep=False):
+        self.durations = sorted(durations)
+        self.stages = stages or STAGES
+        self.keep = keep
+        self.results = []
+
+    def _stub_translator(self, video_name):
+        from mt_translate import MachineTranslator
+
+        class StubMachineTranslator(MachineTranslator):
+            """Real protect/restore/report/SRT code, dictionary lookup instead of NLLB."""
+
+            def load_models(self):
+                self.tok_main = self.tok_fb1 = self.tok_fb2 = None
+                self.acronyms = self._load_glossary_upper()
+
+            def _translate_main_nllb(self, pt_text, target_tokens, num_beams=4):
+                protected, placeholders = self._protect_entities(pt_text)
+                out = " ".join(EN_STUB.get(w.lower(), w) for w in protected.split())
+                return self._clean_punct(self._restore_entities(out, placeholders)), 0.0
+
+        return StubMachineTranslator(video_name)
+
+    def _stub_postprocessor(self, video_name):
+        from pt_postprocess import PortuguesePostProcessor
+
+        pp = PortuguesePostProcessor(video_name)
+        # No punctuation model / LanguageTool: exercise the rule-based path only.
+        pp.USE_PUNCTUATOR = False
+        pp.USE_LT = False
+        return pp
+
+    def _stage_fns(self, video_name, stem):
+        def extract():
+            from extract_audio import AudioExtractor
+            AudioExtractor(video_name).process()
+
+        def postprocess():
+            self._stub_postprocessor(video_name).process()
+
+        def translate():
+            self._stub_translator(video_name).process()
+
+        def ssml():
+            from prosody_and_ssml import ProsodySSMLGenerator
+            ProsodySSMLGenerator(video_name).process()
+
+        def srt():
+            pp = self._stub_postprocessor(video_name)
+            lines = []
+            for seg in SegmentReader(f"work/stt/{stem}_words_aligned.jsonl"):
+                lines.extend(pp.split_for_srt(seg["words"]))
+            pp.write_srt(lines, Path(f"work/stt/{stem}_bench.srt"))
+
+        return {"extract": extract, "postprocess": postprocess, "translate": translate,
+                "ssml": ssml, "srt": srt}
+
+    def run_size(self, duration):
+        cwd = os.getcwd()
+        tmp = tempfile.mkdtemp(prefix=f"bench_{duration}s_")
+        try:
+            os.chdir(tmp)
+            for d in ("input", "work/audio", "work/stt", "work/mt", "work/ssml", "logs", "glossary"):
+                os.makedirs(d, exist_ok=True)
+            with open("glossary/terms.csv", "w", encoding="utf-8") as f:
+                f.write("sub-rede,sub-rede,i\nVPC,VPC,\nlatência,latência,i\n")
+
+            video_name = f"bench_{duration}s.mp4"
+            stem = Path(video_name).stem
+            print(f"\n⏱️  Generating {duration}s synthetic inputs in {tmp}")
+            make_synthetic_video(Path("input") / video_name, duration)
+            transcript = make_synthetic_transcript(duration)
+            meta = {k: v for k, v in transcript.items() if k != "segments"}
+            for suffix in ("_stt.jsonl", "_words_aligned.jsonl"):
+                write_segments(f"work/stt/{stem}{suffix}", transcript["segments"], meta)
+
+            fns = self._stage_fns(video_name, stem)
+            for name in self.stages:
+                res = BenchmarkStage(name, fns[name]).run(duration)
+                res["segments"] = len(transcript["segments"])
+                self.results.append(res)
+                print(f"  {name:<12} {res['seconds']:>9.3f}s  {res['x_realtime']:>9.1f}x RT  "
+                      f"peak {res['peak_mb']:>8.2f} MB")
+        finally:
+            os.chdir(cwd)
+            if not self.keep:
+                shutil.rmtree(tmp, ignore_errors=True)
+
+    def run(self):
+        for duration in self.durations:
+            self.run_size(duration)
+        return self.results
+
+    def check(self, thresholds):
+        """Return a list of human-readable threshold violations."""
+        violations = []
+        by_stage = {}
+        for r in self.results:
+            by_stage.setdefault(r["stage"], []).append(r)
+
+        max_scaling = thresholds.get("max_scaling")
+        for stage, rows in by_stage.items():
+            rows = sorted(rows, key=lambda r: r["input_seconds"])
+            limits = thresholds.get("stages", {}).get(stage, {})
+            for r in rows:
+                if "min_x_realtime" in limits and r["x_realtime"] < limits["min_x_realtime"]:
+                    violations.append(f"{stage}@{r['input_seconds']}s: {r['x_realtime']}x RT "
+                                      f"< min {limits['min_x_realtime']}x")
+                if "max_peak_mb" in limits and r["peak_mb"] > limits["max_peak_mb"]:
+                    violations.append(f"{stage}@{r['input_seconds']}s: peak {r['peak_mb']} MB "
+                                      f"> max {limits['max_peak_mb']} MB")
+            if max_scaling and len(rows) > 1:
+                small, large = rows[0], rows[-1]
+                scaling = large["sec_per_input_min"] / max(small["sec_per_input_min"], 1e-9)
+                if scaling > max_scaling:
+                    violations.append(f"{stage}: {scaling:.2f}x slower per input minute at "
+                                      f"{large['input_seconds']}s than at {small['input_seconds']}s "
+                                      f"(max {max_scaling}x)")
+        return violations
+
+
+def main():
+    ap = argparse.ArgumentParser(description="Offline pipeline benchmark with synthetic media")
+    ap.add_argument("--durations", default="60,600",
+                    help="comma-separated input lengths in seconds (e.g. 60,600,10800)")
+    ap.add_argument("--stages", default=",".join(STAGES),
+                    help=f"comma-separated subset of {','.join(STAGES)}")
+    ap.add_argument("--thresholds", help="JSON file with regression thresholds")
+    ap.add_argument("--report", default="logs/benchmark_report.json")
+    ap.add_argument("--keep", action="store_true", help="keep the temporary work directories")
+    args = ap.parse_args()
+
+    stages = [s.strip() for s in args.stages.split(",") if s.strip()]
+    unknown = set(stages) - set(STAGES)
+    if unknown:
+        ap.error(f"unknown stage(s): {', '.join(sorted(unknown))}")
+    durations = [int(float(d)) for d in args.durations.split(",") if d.strip()]
+    thresholds = {}
+    if args.thresholds:
+        thresholds = json.load(open(args.thresholds, "r", encoding="utf-8"))
+    report_path = Path(args.report).resolve()
+
+    bench = PipelineBenchmark(durations, stages, keep=args.keep)
+    results = bench.run()
+    violations = bench.check(thresholds)
+
+    os.makedirs(report_path.parent, exist_ok=True)
+    json.dump({"results": results, "thresholds": thresholds, "violations": violations},
+              open(report_path, "w", encoding="utf-8"), ensure_ascii=False, indent=2)
+    print(f"\nReport: {report_path}")
+
+    if violations:
+        print("❌ Benchmark thresholds regressed:")
+        for v in violations:
+            print(f"  - {v}")
+        sys.exit(1)
+    print("✅ All benchmark thresholds met")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,80 @@
+"""Worker loop for multi-node runs against a shared input/ and work/.
+
+Every node runs the same loop: walk the videos, and for each one claim the
+first selected stage that is not done yet and whose previous stage is done.
+Stage outputs are written atomically (temp file + rename), and a stage is
+only marked done if its lease was held for the whole run. Failed runs are
+counted in the lease dir; a stage that failed ``max_attempts`` times is not
+retried, and its video counts as finished (with errors) for the idle check.
+"""
+import time
+
+from leases import LeaseManager
+
+
+class DistributedWorker:
+    def __init__(self, run_stage_fn, list_videos_fn, stages, manager=None, poll_interval=5.0):
+        self.run_stage_fn = run_stage_fn
+        self.list_videos_fn = list_videos_fn
+        self.stages = stages
+        self.manager = manager or LeaseManager()
+        self.poll_interval = poll_interval
+
+    def _next_stage(self, video):
+        """First runnable stage of a video: (stage, finished)."""
+        for i, stage in enumerate(self.stages):
+            if self.manager.is_done(video, stage):
+                continue
+            if i > 0 and not self.manager.is_done(video, self.stages[i - 1]):
+                return None, False
+            if self.manager.is_failed(video, stage):
+                return None, True  # given up on: later stages can never run
+            return stage, False
+        return None, True
+
+    def run_video(self, video):
+        """Run as many stages of one video as this node can claim; returns stages run."""
+        ran = 0
+        while True:
+            stage, _ = self._next_stage(video)
+            if stage is None:
+                return ran
+            lease = self.manager.try_acquire(video, stage)
+            if lease is None:
+                return ran
+            with lease:
+                # another node may have finished (or given up on) it between our check and the claim
+                if self.manager.is_done(video, stage) or self.manager.is_failed(video, stage):
+                    continue
+                print(f"🔒 [{self.manager.node_id}] {video}:{stage}")
+                t0 = time.perf_counter()
+                result = self.run_stage_fn(video, stage)
+                if not result:
+                    attempts = self.manager.record_failure(video, stage, "stage failed")
+                    giving_up = " - giving up" if attempts >= self.manager.max_attempts else ""
+                    print(f"❌ [{self.manager.node_id}] {video}:{stage} failed "
+                          f"(attempt {attempts}/{self.manager.max_attempts}){giving_up}")
+                    return ran
+                if lease.lost:
+                    print(f"[WARN] {video}:{stage} finished after its lease was lost; not marking done")
+                    return ran
+                self.manager.mark_done(video, stage, seconds=round(time.perf_counter() - t0, 3))
+                ran += 1
+                if getattr(result, "reused", False):
+                    # outputs were copied from an earlier upload of the same audio
+                    for later in self.stages[self.stages.index(stage) + 1:]:
+                        self.manager.mark_done(video, later, reused=True)
+
+    def run(self, exit_when_idle=False):
+        print(f"🛰️  Worker {self.manager.node_id} | leases: {self.manager.root} | "
+              f"ttl {self.manager.ttl:.0f}s | stages: {' → '.join(self.stages)}")
+        while True:
+            videos = self.list_videos_fn()
+            ran = sum(self.run_video(v) for v in videos)
+            if ran:
+                continue
+            all_done = all(self._next_stage(v)[1] for v in videos)
+            if exit_when_idle and all_done:
+                print(f"🏁 [{self.manager.node_id}] nothing left to do")
+                return
+            time.sleep(self.poll_interval)
@@ -0,0 +1,96 @@
+"""Draft → refine bookkeeping.
+
+The draft tier writes the normal output layout quickly (small Whisper,
+greedy, no alignment, Opus-MT). Refinement re-runs the full models over the
+same files in place; before it starts, the draft English segments are kept
+as ``work/mt/<stem>_en_segments.draft.jsonl`` so a diff report of what the
+full models changed can be written to ``logs/<stem>_refine_diff.json``.
+"""
+import difflib, json, os, re, shutil
+from pathlib import Path
+
+from atomic_io import atomic_open
+from segment_store import SegmentReader, index_path
+
+
+def _paths(video_name):
+    stem = Path(video_name).stem
+    return (Path(f"work/mt/{stem}_en_segments.jsonl"),
+            Path(f"work/mt/{stem}_en_segments.draft.jsonl"),
+            Path(f"logs/{stem}_refine_diff.json"))
+
+
+def snapshot_draft(video_name):
+    """Keep a copy of the draft English segments; returns False if there is no draft."""
+    current, draft, _ = _paths(video_name)
+    if not current.exists():
+        return False
+    shutil.copyfile(current, draft)
+    if index_path(current).exists():
+        shutil.copyfile(index_path(current), index_path(draft))
+    return True
+
+
+def _norm(text):
+    return re.sub(r"\s+", " ", (text or "").strip().lower())
+
+
+def _windows(draft, refined, tol=0.1):
+    """Group draft and refined segments into shared time windows.
+
+    Both tiers cut segments at different points, so segments are chained into
+    one window while they overlap (by more than ``tol`` seconds, to ignore
+    boundary jitter). Returns [(start, end, draft_idx, refined_idx)].
+    """
+    items = sorted([(float(x["start"]), float(x["end"]), 0, k) for k, x in enumerate(draft)] +
+                   [(float(x["start"]), float(x["end"]), 1, k) for k, x in enumerate(refined)])
+    windows = []
+    for start, end, src, k in items:
+        if windows and start < windows[-1][1] - tol:
+            w = windows[-1]
+            w[1] = max(w[1], end)
+        else:
+            w = [start, end, [], []]
+            windows.append(w)
+        w[2 + src].append(k)
+    return [tuple(w) for w in windows]
+
+
+def write_refine_diff(video_name):
+    """Compare draft and refined text per shared time window and write the diff report."""
+    current, draft_path, out_log = _paths(video_name)
+    if not draft_path.exists() or not current.exists():
+        return None
+    draft = list(SegmentReader(draft_path))
+    refined = list(SegmentReader(current))
+
+    changed, dropped, unchanged = [], [], 0
+    windows = _windows(draft, refined)
+    for start, end, d_idx, r_idx in windows:
+        draft_text = " ".join(t for t in (draft[k].get("en_text", "") for k in sorted(d_idx)) if t)
+        refined_text = " ".join(t for t in (refined[k].get("en_text", "") for k in sorted(r_idx)) if t)
+        if _norm(draft_text) == _norm(refined_text):
+            unchanged += 1
+            continue
+        entry = {
+            "start": round(start, 3), "end": round(end, 3),
+            "draft_segments": sorted(d_idx), "refined_segments": sorted(r_idx),
+            "draft": draft_text, "refined": refined_text,
+        }
+        if not r_idx:
+            dropped.append(entry)
+            continue
+        entry["similarity"] = round(difflib.SequenceMatcher(None, _norm(draft_text), _norm(refined_text)).ratio(), 3)
+        changed.append(entry)
+
+    report = {
+        "video": video_name,
+        "draft_segments": len(draft), "refined_segments": len(refined), "windows": len(windows),
+        "changed": len(changed), "unchanged": unchanged, "draft_only": len(dropped),
+        "segments": changed, "draft_only_segments": dropped,
+    }
+    os.makedirs(out_log.parent, exist_ok=True)
+    with atomic_open(out_log) as f:
+        json.dump(report, f, ensure_ascii=False, indent=2)
+    print(f"OK: {out_log} ({len(changed)} of {len(windows)} windows changed, {unchanged} unchanged)")
+    return report
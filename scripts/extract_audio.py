@@ -2,6 +2,8 @@ import ffmpeg
 from fractions import Fraction
 from pathlib import Path
 import os
+from atomic_io import atomic_path
+from speech_regions import SpeechRegions, detect_speech_regions
 
 class AudioExtractor:
     def __init__(self, video_name):
@@ -9,6 +11,7 @@ class AudioExtractor:
         self.input_path = f'input/{video_name}'
         self.output_path = f'work/audio/{Path(video_name).stem}_16k_mono.wav'
         self.clean_output_path = f'work/audio/{Path(video_name).stem}_clean.wav'
+        self.regions_path = f'work/audio/{Path(video_name).stem}_speech_regions.json'
 
     def process(self):
         # Create output directory
@@ -27,11 +30,18 @@ class AudioExtractor:
         print('Format info:', finfo)
 
         # 4) ffmpeg: processamento de áudio para WAV 16 kHz mono com filtros
-        self.process_audio(self.input_path, self.output_path)
+        with atomic_path(self.output_path) as tmp:
+            self.process_audio(self.input_path, str(tmp))
         print('Processamento concluído:', self.output_path)
 
-        # 5) ffmpeg: limpeza simples de áudio para WAV 16 kHz mono sem filtros
-        self.clean_audio_quick(self.input_path, self.clean_output_path)
+        # 5) VAD por energia: índice de regiões de fala usado por STT, alinhamento e F0
+        regions = SpeechRegions(detect_speech_regions(self.output_path))
+        regions.save(self.regions_path)
+        print(f'Regiões de fala: {len(regions.regions)} ({regions.speech_ratio:.0%} fala):', self.regions_path)
+
+        # 6) ffmpeg: limpeza simples de áudio para WAV 16 kHz mono sem filtros
+        with atomic_path(self.clean_output_path) as tmp:
+            self.clean_audio_quick(self.input_path, str(tmp))
         print('Limpeza concluída:', self.clean_output_path)
 
     def get_video_stream_info(self, input_path):
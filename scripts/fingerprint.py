@@ -0,0 +1,267 @@
+"""Acoustic fingerprinting to reuse work/ artifacts of re-uploaded videos.
+
+Runs after ``AudioExtractor`` on the 16 kHz mono WAV. The fingerprint is a
+sequence of 32-bit sub-fingerprints (sign of the time/frequency derivative
+of 33 log-spaced band energies, 300-2000 Hz, one per 64 ms hop). It survives
+re-encoding, bitrate and container changes, which byte hashes do not.
+
+Every fingerprinted video gets ``work/fingerprints/<stem>.npy`` plus a
+``<stem>.json`` index entry. One entry file per video (listed with glob)
+means nodes fingerprinting different videos at once never overwrite each
+other's entries.
+A new video is matched against indexed videos whose pipeline outputs are
+complete. The offset is found by voting on exact sub-fingerprint hits,
+then scored by bit agreement over the overlap. If the new audio is fully
+covered by an earlier video (same lecture, or a trimmed version of it),
+that video's STT/MT/SSML artifacts are copied with timestamps shifted by
+the offset, and the rest of the pipeline is skipped.
+"""
+import json, os, re, time
+from pathlib import Path
+
+from atomic_io import atomic_open
+from segment_store import SegmentReader, SegmentWriter
+
+SR = 16000
+FRAME = 4096
+HOP = 1024
+HOP_S = HOP / SR
+N_BANDS = 33
+
+# Per-video artifacts reused on a match: (template, kind)
+ARTIFACTS = [
+    ("work/stt/{stem}_stt.jsonl", "segments"),
+    ("work/stt/{stem}_words_aligned.jsonl", "segments"),
+    ("work/stt/{stem}_pt_clean.jsonl", "segments"),
+    ("work/stt/{stem}_pt_clean.srt", "srt"),
+    ("work/mt/{stem}_en_segments.jsonl", "segments"),
+    ("work/mt/{stem}_en.srt", "srt"),
+    ("logs/{stem}_mt_report.json", "report"),
+    ("work/ssml/{stem}_en_ssml.jsonl", "segments"),
+    ("work/ssml/{stem}_en_ssml_preview.srt", "srt"),
+    ("logs/{stem}_ssml_report.json", "report"),
+]
+# A video can serve as a reuse source only once these exist
+REQUIRED = [t for t, kind in ARTIFACTS if kind == "segments"]
+
+
+def compute_fingerprint(audio_path):
+    """Stream the WAV and return a uint32 array of sub-fingerprints."""
+    import numpy as np
+    import soundfile as sf
+
+    edges = np.geomspace(300.0, 2000.0, N_BANDS + 1)
+    freqs = np.fft.rfftfreq(FRAME, 1.0 / SR)
+    band_of = np.digitize(freqs, edges) - 1
+    valid = (band_of >= 0) & (band_of < N_BANDS)
+    window = np.hanning(FRAME).astype(np.float32)
+
+    energies = []
+    frames_per_block = 512
+    blocksize = HOP * frames_per_block + FRAME - HOP
+    for block in sf.blocks(str(audio_path), blocksize=blocksize, overlap=FRAME - HOP,
+                           dtype="float32", always_2d=True):
+        mono = block.mean(axis=1)
+        if len(mono) < FRAME:
+            break
+        n = 1 + (len(mono) - FRAME) // HOP
+        idx = np.arange(FRAME)[None, :] + HOP * np.arange(n)[:, None]
+        spec = np.abs(np.fft.rfft(mono[idx] * window, axis=1)) ** 2
+        e = np.zeros((n, N_BANDS), dtype=np.float64)
+        for b in range(N_BANDS):
+            e[:, b] = spec[:, valid & (band_of == b)].sum(axis=1)
+        energies.append(e)
+    if not energies:
+        return np.zeros(0, dtype=np.uint32)
+    e = np.concatenate(energies)
+
+    d = e[:, :-1] - e[:, 1:]                       # across bands
+    bits = (d[1:] - d[:-1]) > 0                    # across time
+    weights = (1 << np.arange(31, -1, -1, dtype=np.uint64)).astype(np.uint64)
+    return (bits.astype(np.uint64) @ weights).astype(np.uint32)
+
+
+def match(query, ref, sample_step=2):
+    """Best alignment of ``query`` inside ``ref``.
+
+    Returns (similarity, offset_frames, overlap_frames), where query frame q
+    lines up with ref frame q + offset_frames and similarity is the share of
+    agreeing bits over the overlap (about 0.5 for unrelated audio).
+    """
+    import numpy as np
+
+    if len(query) == 0 or len(ref) == 0:
+        return 0.0, 0, 0
+    order = np.argsort(ref, kind="stable")
+    sorted_ref = ref[order]
+    q_pos = np.arange(0, len(query), sample_step)
+    q_vals = query[q_pos]
+    lo = np.searchsorted(sorted_ref, q_vals, side="left")
+    hi = np.searchsorted(sorted_ref, q_vals, side="right")
+    # vote only with sub-fingerprints that are unique in ref: repeated values
+    # (silence, steady tones) would vote for many offsets at once
+    hits = (hi - lo) == 1
+    if not hits.any():
+        return 0.0, 0, 0
+    offsets = order[lo[hits]] - q_pos[hits]
+    values, counts = np.unique(offsets, return_counts=True)
+    offset = int(values[np.argmax(counts)])
+
+    q0 = max(0, -offset)
+    q1 = min(len(query), len(ref) - offset)
+    if q1 <= q0:
+        return 0.0, offset, 0
+    x = np.bitwise_xor(query[q0:q1], ref[q0 + offset:q1 + offset])
+    ber = np.unpackbits(x.view(np.uint8)).mean()
+    return float(1.0 - ber), offset, int(q1 - q0)
+
+
+def shift_srt(src, dst, shift, duration):
+    """Copy an SRT shifting cue times by ``shift`` seconds; cues outside [0, duration] are dropped."""
+    def parse(ts):
+        h, m, s = ts.replace(",", ".").split(":")
+        return int(h) * 3600 + int(m) * 60 + float(s)
+
+    def fmt(t):
+        h = int(t//3600); m = int((t%3600)//60); s = t%60
+        return f"{h:02d}:{m:02d}:{s:06.3f}".replace(".", ",")
+
+    blocks = re.split(r"\n\s*\n", Path(src).read_text(encoding="utf-8").strip("\n"))
+    with atomic_open(dst) as f:
+        n = 0
+        for block in blocks:
+            lines = block.split("\n")
+            if len(lines) < 2 or "-->" not in lines[1]:
+                continue
+            a, b = [x.strip() for x in lines[1].split("-->")]
+            start, end = parse(a) + shift, parse(b) + shift
+            if end <= 0 or start >= duration:
+                continue
+            n += 1
+            text = "\n".join(lines[2:])
+            f.write(f"{n}\n{fmt(max(0.0, start))} --> {fmt(min(duration, end))}\n{text}\n\n")
+
+
+def _shift_item(item, shift, duration):
+    out = dict(item)
+    out["start"] = round(max(0.0, float(item["start"]) + shift), 3)
+    out["end"] = round(min(duration, float(item["end"]) + shift), 3)
+    if item.get("words"):
+        out["words"] = [
+            {**w, "start": round(float(w["start"]) + shift, 3), "end": round(float(w["end"]) + shift, 3)}
+            if "start" in w and "end" in w else w
+            for w in item["words"]
+        ]
+    return out
+
+
+def _in_range(item, shift, duration):
+    return float(item["end"]) + shift > 0 and float(item["start"]) + shift < duration
+
+
+class AudioFingerprinter:
+    def __init__(self, video_name):
+        self.video_name = video_name
+        self.stem = Path(video_name).stem
+        self.audio_path = f"work/audio/{self.stem}_16k_mono.wav"
+        self.fp_dir = Path("work/fingerprints")
+        self.fp_path = self.fp_dir / f"{self.stem}.npy"
+        self.entry_path = self.fp_dir / f"{self.stem}.json"
+        self.out_log = Path(f"logs/{self.stem}_dedup_report.json")
+        self.min_similarity = 0.70
+        self.min_coverage = 0.95
+        self.reused = False
+
+    def compute(self):
+        return compute_fingerprint(self.audio_path)
+
+    def load_index(self):
+        """All indexed videos as {stem: entry}."""
+        index = {}
+        for path in self.fp_dir.glob("*.json"):
+            try:
+                index[path.stem] = json.load(open(path, "r", encoding="utf-8"))
+            except (OSError, ValueError):
+                continue
+        return index
+
+    def register(self, fp):
+        import numpy as np
+        os.makedirs(self.fp_dir, exist_ok=True)
+        with atomic_open(self.fp_path, "wb") as f:
+            np.save(f, fp)
+        entry = {
+            "video": self.video_name, "fingerprint": str(self.fp_path),
+            "frames": int(len(fp)), "duration": round(len(fp) * HOP_S, 3), "added_at": time.time(),
+        }
+        with atomic_open(self.entry_path) as f:
+            json.dump(entry, f, ensure_ascii=False, indent=2)
+
+    def find_match(self, fp):
+        """Best complete, indexed video covering this audio, as a dict, or None."""
+        import numpy as np
+        best = None
+        for stem, entry in self.load_index().items():
+            if stem == self.stem:
+                continue
+            if entry["frames"] < len(fp) * self.min_coverage:
+                continue  # too short to cover the new audio
+            if not all(Path(t.format(stem=stem)).exists() for t in REQUIRED):
+                continue
+            ref = np.load(entry["fingerprint"])
+            similarity, offset, overlap = match(fp, ref)
+            coverage = overlap / max(1, len(fp))
+            if similarity >= self.min_similarity and coverage >= self.min_coverage:
+                if best is None or similarity > best["similarity"]:
+                    best = {"stem": stem, "video": entry["video"], "similarity": round(similarity, 4),
+                            "offset_s": round(offset * HOP_S, 3), "coverage": round(coverage, 4)}
+        return best
+
+    def reuse(self, m, duration):
+        """Copy the matched video's artifacts under this stem, shifted onto this timeline."""
+        shift = -m["offset_s"]
+        copied = []
+        for template, kind in ARTIFACTS:
+            src = Path(template.format(stem=m["stem"]))
+            dst = Path(template.format(stem=self.stem))
+            if not src.exists():
+                continue
+            os.makedirs(dst.parent, exist_ok=True)
+            if kind == "segments":
+                reader = SegmentReader(src)
+                with SegmentWriter(dst, reader.meta) as out:
+                    for seg in reader:
+                        if _in_range(seg, shift, duration):
+                            out.append(_shift_item(seg, shift, duration))
+            elif kind == "srt":
+                shift_srt(src, dst, shift, duration)
+            else:
+                items = json.load(open(src, "r", encoding="utf-8"))
+                if isinstance(items, list):
+                    items = [_shift_item(x, shift, duration) for x in items
+                             if "start" in x and _in_range(x, shift, duration)]
+                with atomic_open(dst) as f:
+                    json.dump(items, f, ensure_ascii=False, indent=2)
+            copied.append(str(dst))
+        return copied
+
+    def process(self):
+        import soundfile as sf
+        fp = self.compute()
+        duration = sf.info(self.audio_path).duration
+        m = self.find_match(fp)
+        self.register(fp)
+
+        report = {"video": self.video_name, "frames": int(len(fp)), "match": m, "reused": []}
+        if m is not None:
+            kind = "full" if abs(m["offset_s"]) < 0.5 else "partial"
+            m["kind"] = kind
+            print(f"Duplicado ({kind}) de {m['video']}: similaridade {m['similarity']:.2f}, "
+                  f"offset {m['offset_s']:+.2f}s")
+            report["reused"] = self.reuse(m, duration)
+            self.reused = True
+        os.makedirs(self.out_log.parent, exist_ok=True)
+        with atomic_open(self.out_log) as f:
+            json.dump(report, f, ensure_ascii=False, indent=2)
+        print(f"OK: {self.fp_path} | Report: {self.out_log}")
+        return self.reused
@@ -0,0 +1,234 @@
+"""Incremental re-translation after edits to ``glossary/terms.csv``.
+
+The glossary-impact index is stored next to the outputs it describes:
+
+- ``work/stt/<stem>_pt_clean.jsonl``: the header holds a snapshot of the
+  glossary used (``{"glossary": [{"find", "replace", "flags"}, ...]}``); every
+  segment keeps its text before the glossary was applied (``pre_glossary``)
+  and the entries that matched it (``glossary_hits``).
+- ``work/mt/<stem>_en_segments.jsonl``: the header holds the protected
+  acronym list, every segment the acronyms it contained (``entities``).
+
+``GlossaryUpdater`` diffs the current glossary against the snapshot. A
+segment is re-post-processed if it matched a changed or removed entry, or
+if an added or changed entry matches its text now. Only segments whose PT
+text changed, or that contain an added or removed acronym, are re-translated.
+The affected records are then patched into ``_pt_clean``, ``_en_segments``,
+the SRTs, the MT report and the SSML outputs. All other segments are copied
+as they are.
+
+    python main.py --glossary-update            # all processed videos
+    python main.py --glossary-update --video lecture.mp4
+"""
+import json, os, re
+from pathlib import Path
+
+from atomic_io import atomic_open
+from pt_postprocess import PortuguesePostProcessor, read_terms
+from segment_store import SegmentReader, SegmentWriter
+
+
+def diff_terms(old, new):
+    """Entries (by ``find``) added, changed (replacement or flags) and removed."""
+    old_by, new_by = {t["find"]: t for t in old}, {t["find"]: t for t in new}
+    return {
+        "added": [f for f in new_by if f not in old_by],
+        "changed": [f for f in new_by if f in old_by and new_by[f] != old_by[f]],
+        "removed": [f for f in old_by if f not in new_by],
+    }
+
+
+def _term_pattern(term):
+    return re.compile(re.escape(term["find"]), re.IGNORECASE if "i" in term["flags"] else 0)
+
+
+def _acronym_pattern(acronym):
+    return re.compile(rf"\b{re.escape(acronym)}\b")
+
+
+class GlossaryImpactIndex:
+    """Answers which segments a glossary edit can affect."""
+
+    def __init__(self, old_terms, new_terms):
+        self.diff = diff_terms(old_terms, new_terms)
+        new_by = {t["find"]: t for t in new_terms}
+        self.stale = set(self.diff["changed"]) | set(self.diff["removed"])
+        # entries that may now match text they did not touch before
+        self.candidates = [(f, _term_pattern(new_by[f])) for f in self.diff["added"] + self.diff["changed"]]
+
+    def reasons(self, seg):
+        """Why a ``_pt_clean`` segment must be re-post-processed ([] if it need not be)."""
+        out = [f"hit:{f}" for f in seg.get("glossary_hits", []) if f in self.stale]
+        texts = (seg.get("pre_glossary", ""), seg.get("text", ""))
+        for find, pattern in self.candidates:
+            if f"hit:{find}" not in out and any(pattern.search(t) for t in texts):
+                out.append(f"match:{find}")
+        return out
+
+
+def acronym_reasons(en_seg, pt_text, added, removed):
+    """Acronyms whose protection changed for an ``_en_segments`` record."""
+    entities = en_seg.get("entities")
+    out = [f"acronym-added:{a}" for a in added if _acronym_pattern(a).search(pt_text)]
+    for a in removed:
+        if (a in entities) if entities is not None else _acronym_pattern(a).search(pt_text):
+            out.append(f"acronym-removed:{a}")
+    return out
+
+
+def _rewrite(reader, path, meta, patches):
+    """Copy ``reader`` to ``path`` with the records in ``patches`` (index -> segment) replaced."""
+    with SegmentWriter(path, meta) as out:
+        for i, seg in enumerate(reader):
+            out.append(patches.get(i, seg))
+
+
+class GlossaryUpdater:
+    def __init__(self, video_name):
+        self.video_name = video_name
+        stem = Path(video_name).stem
+        self.glossary_csv = Path("glossary/terms.csv")
+        self.pt_json = Path(f"work/stt/{stem}_pt_clean.jsonl")
+        self.pt_srt = Path(f"work/stt/{stem}_pt_clean.srt")
+        self.en_json = Path(f"work/mt/{stem}_en_segments.jsonl")
+        self.en_srt = Path(f"work/mt/{stem}_en.srt")
+        self.mt_log = Path(f"logs/{stem}_mt_report.json")
+        self.words_json = Path(f"work/stt/{stem}_words_aligned.jsonl")
+        self.ssml_json = Path(f"work/ssml/{stem}_en_ssml.jsonl")
+        self.ssml_srt = Path(f"work/ssml/{stem}_en_ssml_preview.srt")
+        self.out_log = Path(f"logs/{stem}_glossary_update.json")
+        # set when the outputs predate the impact index: the caller must then
+        # re-run postprocess/translate/ssml in full
+        self.needs_full = False
+
+    def _has_index(self, pt_reader, en_reader):
+        if "glossary" not in pt_reader.meta or (len(pt_reader) and "pre_glossary" not in pt_reader[0]):
+            return False
+        return en_reader is None or "acronyms" in en_reader.meta
+
+    def update_pt(self, pt_reader, index, new_terms):
+        """Re-apply glossary + LanguageTool to affected segments; returns (changed indexes, affected)."""
+        affected = {}
+        for i, seg in enumerate(pt_reader):
+            why = index.reasons(seg)
+            if why:
+                affected[i] = why
+        patches, pp = {}, None
+        if affected:
+            pp = PortuguesePostProcessor(self.video_name)
+            subs = pp.read_glossary(self.glossary_csv)
+            for i in affected:
+                seg = pt_reader[i]
+                hits = []
+                txt = pp.lt_fix(pp.apply_glossary(seg["pre_glossary"], subs, hits)).strip()
+                if txt != seg["text"] or [new_terms[k]["find"] for k in hits] != seg["glossary_hits"]:
+                    patches[i] = {**seg, "text": txt, "glossary_hits": [new_terms[k]["find"] for k in hits]}
+        changed = [i for i in patches if patches[i]["text"] != pt_reader[i]["text"]]
+
+        meta = {**pt_reader.meta, "glossary": new_terms}
+        _rewrite(pt_reader, self.pt_json, meta, patches)
+        if changed:
+            pp.write_srt([line for seg in SegmentReader(self.pt_json) for line in pp.srt_lines(seg)], self.pt_srt)
+        return changed, affected
+
+    def update_en(self, en_reader, pt_changed):
+        """Re-translate segments whose PT text or protected acronyms changed; returns {idx: reasons}."""
+        from mt_translate import MachineTranslator
+        pt_reader = SegmentReader(self.pt_json)
+        if len(pt_reader) != len(en_reader):
+            raise RuntimeError(f"PT/EN segment count mismatch ({len(pt_reader)} vs {len(en_reader)})")
+
+        mt = MachineTranslator(self.video_name, tier=en_reader.meta.get("tier", "full"))
+        old_acronyms = set(en_reader.meta["acronyms"])
+        acronyms = mt._load_glossary_upper()
+        added, removed = sorted(set(acronyms) - old_acronyms), sorted(old_acronyms - set(acronyms))
+
+        retranslate = {i: ["pt-changed"] for i in pt_changed}
+        if added or removed:
+            for i, (pt, en) in enumerate(zip(pt_reader, en_reader)):
+                why = acronym_reasons(en, pt["text"], added, removed)
+                if why:
+                    retranslate.setdefault(i, []).extend(why)
+
+        patches, items = {}, {}
+        if retranslate:
+            mt.load_models()
+            for i in sorted(retranslate):
+                pt = pt_reader[i]
+                start, end = float(pt["start"]), float(pt["end"])
+                patches[i], items[i] = mt.translate_segment(start, end, (pt.get("text") or "").strip())
+
+        en_changed = {i: retranslate[i] for i in patches
+                      if patches[i]["en_text"] != en_reader[i]["en_text"]}
+        meta = {**en_reader.meta, "acronyms": acronyms}
+        _rewrite(en_reader, self.en_json, meta, patches)
+        if patches:
+            with atomic_open(self.en_srt) as srt:
+                for i, seg in enumerate(SegmentReader(self.en_json), 1):
+                    srt.write(f"{i}\n{mt._to_srt_time(float(seg['start']))} --> "
+                              f"{mt._to_srt_time(float(seg['end']))}\n{seg['en_text']}\n\n")
+            if self.mt_log.exists():
+                report = json.load(open(self.mt_log, "r", encoding="utf-8"))
+                if len(report) == len(en_reader):
+                    for i, item in items.items():
+                        report[i] = item
+                    with atomic_open(self.mt_log) as f:
+                        json.dump(report, f, ensure_ascii=False, indent=2)
+        return en_changed
+
+    def update_ssml(self, en_changed):
+        """Rebuild the SSML of re-translated segments from the stored prosody features."""
+        from prosody_and_ssml import ProsodySSMLGenerator
+        gen = ProsodySSMLGenerator(self.video_name)
+        ssml_reader, en_reader = SegmentReader(self.ssml_json), SegmentReader(self.en_json)
+        words_reader = SegmentReader(self.words_json)
+        patches = {}
+        for i in en_changed:
+            rec = ssml_reader[i]
+            en_text = en_reader[i]["en_text"]
+            words = words_reader[i].get("words") or []
+            patches[i] = {**rec, "en_text": en_text,
+                          "ssml": gen.build_ssml(en_text, words, rec["rate_pct"], rec["pitch_cat"])}
+        _rewrite(ssml_reader, self.ssml_json, ssml_reader.meta, patches)
+        with atomic_open(self.ssml_srt) as srt:
+            for i, seg in enumerate(SegmentReader(self.ssml_json), 1):
+                srt.write(f"{i}\n{gen._to_srt_time(float(seg['start']))} --> "
+                          f"{gen._to_srt_time(float(seg['end']))}\n{gen.preview(seg['ssml'])}\n\n")
+
+    def process(self):
+        if not (self.pt_json.exists() or self.pt_json.with_suffix(".json").exists()):
+            print(f"[INFO] {self.video_name}: sem {self.pt_json}, nada a atualizar")
+            return
+        pt_reader = SegmentReader(self.pt_json)
+        en_reader = SegmentReader(self.en_json) if self.en_json.exists() else None
+        if not self._has_index(pt_reader, en_reader):
+            print(f"[INFO] {self.video_name}: saídas sem índice de glossário; reprocessamento completo necessário")
+            self.needs_full = True
+            return
+
+        new_terms = read_terms(self.glossary_csv)
+        index = GlossaryImpactIndex(pt_reader.meta["glossary"], new_terms)
+        pt_changed, pt_affected = self.update_pt(pt_reader, index, new_terms)
+
+        en_changed = {}
+        if en_reader is not None:
+            en_changed = self.update_en(en_reader, pt_changed)
+        if en_changed and self.ssml_json.exists():
+            self.update_ssml(sorted(en_changed))
+
+        total = len(pt_reader)
+        report = {
+            "video": self.video_name, "glossary": index.diff, "segments": total,
+            "pt_affected": len(pt_affected), "pt_changed": len(pt_changed),
+            "en_changed": len(en_changed),
+            "affected_segments": [
+                {"idx": i, "reasons": pt_affected.get(i, []) + en_changed.get(i, []),
+                 "pt_changed": i in pt_changed, "en_changed": i in en_changed}
+                for i in sorted(set(pt_affected) | set(en_changed))
+            ],
+        }
+        os.makedirs(self.out_log.parent, exist_ok=True)
+        with atomic_open(self.out_log) as f:
+            json.dump(report, f, ensure_ascii=False, indent=2)
+        print(f"OK: {self.video_name} | {len(pt_affected)}/{total} segmentos afetados, "
+              f"{len(en_changed)} retraduzidos | Report: {self.out_log}")
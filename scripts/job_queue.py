@@ -0,0 +1,135 @@
+"""Durable local job queue (SQLite) for the watch-folder daemon.
+
+A job is one version of one input file, identified by (video, size, mtime):
+re-dropping an identical file is a no-op, replacing it with a new file
+enqueues a new job. State transitions are committed immediately, and jobs
+left ``running`` by a crashed/killed daemon go back to ``pending`` on the
+next start (or to ``failed`` once out of attempts), so work is neither lost
+nor run twice to completion.
+"""
+import sqlite3, time
+from pathlib import Path
+
+PENDING, RUNNING, DONE, FAILED = "pending", "running", "done", "failed"
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS jobs (
+    id          INTEGER PRIMARY KEY AUTOINCREMENT,
+    video       TEXT    NOT NULL,
+    size        INTEGER NOT NULL,
+    mtime       REAL    NOT NULL,
+    status      TEXT    NOT NULL DEFAULT 'pending',
+    attempts    INTEGER NOT NULL DEFAULT 0,
+    error       TEXT,
+    enqueued_at REAL    NOT NULL,
+    started_at  REAL,
+    finished_at REAL,
+    UNIQUE (video, size, mtime)
+);
+CREATE INDEX IF NOT EXISTS jobs_status ON jobs (status, id);
+"""
+
+
+class JobQueue:
+    def __init__(self, db_path="work/queue.sqlite3", max_attempts=3):
+        self.db_path = Path(db_path)
+        self.max_attempts = max_attempts
+        self.db_path.parent.mkdir(parents=True, exist_ok=True)
+        # isolation_level=None: explicit transactions only, every statement
+        # outside BEGIN is committed on its own.
+        self.conn = sqlite3.connect(str(self.db_path), timeout=30, isolation_level=None)
+        self.conn.row_factory = sqlite3.Row
+        self.conn.execute("PRAGMA journal_mode=WAL")
+        self.conn.execute("PRAGMA synchronous=FULL")
+        self.conn.executescript(SCHEMA)
+
+    def close(self):
+        self.conn.close()
+
+    def enqueue(self, video, size, mtime):
+        """Add a job; returns True if it is new, False if already known."""
+        cur = self.conn.execute(
+            "INSERT OR IGNORE INTO jobs (video, size, mtime, enqueued_at) VALUES (?, ?, ?, ?)",
+            (video, int(size), float(mtime), time.time()),
+        )
+        return cur.rowcount == 1
+
+    def recover(self):
+        """Requeue jobs interrupted by a previous crash; returns how many.
+
+        A job that already used all its attempts is marked failed instead: it
+        most likely took the daemon down itself (OOM, native crash), so
+        requeueing it would crash-loop under a restarting supervisor.
+        """
+        self.conn.execute("BEGIN IMMEDIATE")
+        try:
+            self.conn.execute(
+                "UPDATE jobs SET status = ?, error = ?, finished_at = ? WHERE status = ? AND attempts >= ?",
+                (FAILED, "interrupted by a daemon crash on every attempt", time.time(),
+                 RUNNING, self.max_attempts),
+            )
+            cur = self.conn.execute(
+                "UPDATE jobs SET status = ?, started_at = NULL WHERE status = ?", (PENDING, RUNNING)
+            )
+            self.conn.execute("COMMIT")
+        except Exception:
+            self.conn.execute("ROLLBACK")
+            raise
+        return cur.rowcount
+
+    def claim_next(self):
+        """Atomically move the oldest pending job to running and return it."""
+        self.conn.execute("BEGIN IMMEDIATE")
+        try:
+            row = self.conn.execute(
+                "SELECT * FROM jobs WHERE status = ? ORDER BY id LIMIT 1", (PENDING,)
+            ).fetchone()
+            if row is None:
+                self.conn.execute("COMMIT")
+                return None
+            self.conn.execute(
+                "UPDATE jobs SET status = ?, attempts = attempts + 1, started_at = ?, error = NULL "
+                "WHERE id = ?", (RUNNING, time.time(), row["id"]),
+            )
+            self.conn.execute("COMMIT")
+        except Exception:
+            self.conn.execute("ROLLBACK")
+            raise
+        return self.get(row["id"])
+
+    def complete(self, job_id):
+        self.conn.execute(
+            "UPDATE jobs SET status = ?, finished_at = ? WHERE id = ?", (DONE, time.time(), job_id)
+        )
+
+    def fail(self, job_id, error):
+        """Mark a job failed, or put it back in the queue while attempts remain."""
+        job = self.get(job_id)
+        status = PENDING if job and job["attempts"] < self.max_attempts else FAILED
+        self.conn.execute(
+            "UPDATE jobs SET status = ?, error = ?, finished_at = ? WHERE id = ?",
+            (status, str(error)[:2000], time.time(), job_id),
+        )
+        return status
+
+    def get(self, job_id):
+        row = self.conn.execute("SELECT * FROM jobs WHERE id = ?", (job_id,)).fetchone()
+        return dict(row) if row else None
+
+    def depth(self):
+        return self.conn.execute(
+            "SELECT COUNT(*) FROM jobs WHERE status = ?", (PENDING,)
+        ).fetchone()[0]
+
+    def counts(self):
+        counts = {PENDING: 0, RUNNING: 0, DONE: 0, FAILED: 0}
+        for row in self.conn.execute("SELECT status, COUNT(*) AS n FROM jobs GROUP BY status"):
+            counts[row["status"]] = row["n"]
+        return counts
+
+    def jobs(self, limit=50):
+        rows = self.conn.execute("SELECT * FROM jobs ORDER BY id DESC LIMIT ?", (limit,))
+        return [dict(r) for r in rows]
+
+    def status(self, limit=50):
+        return {"depth": self.depth(), "counts": self.counts(), "jobs": self.jobs(limit)}
@@ -0,0 +1,181 @@
+"""Lease files for running the pipeline on several nodes over shared storage.
+
+Work is claimed per (video, stage). A lease is a small JSON file under
+``work/leases`` created with O_CREAT|O_EXCL, so exactly one node wins it.
+The owner keeps it alive by touching its mtime from a heartbeat thread;
+a lease whose mtime is older than ``ttl`` belongs to a crashed node and is
+reclaimed by renaming it away (atomic, only one reclaimer succeeds) and
+creating a fresh one. Finished stages leave a ``.done`` marker. Failed
+runs are counted in a ``.failed`` marker; after ``max_attempts`` failures
+the unit is given up on (until the marker is cleared).
+
+Expiry is judged entirely on the storage server's clock: lease mtimes are
+set by the server on touch, and a lease's age is measured against the mtime
+of a probe file (``.clock.<node>``) this node touches just before, never
+against the local ``time.time()``. Node clocks therefore do not need to
+agree. ``ttl`` should still be several heartbeats long.
+"""
+import json, os, socket, threading, time, uuid
+from pathlib import Path
+
+from atomic_io import atomic_open
+
+
+class Lease:
+    def __init__(self, path, token, node_id, heartbeat_interval):
+        self.path = Path(path)
+        self.token = token
+        self.node_id = node_id
+        self.heartbeat_interval = heartbeat_interval
+        self.lost = False
+        self._stop = threading.Event()
+        self._thread = threading.Thread(target=self._heartbeat, daemon=True)
+        self._thread.start()
+
+    def _owned(self):
+        try:
+            return json.loads(self.path.read_text(encoding="utf-8")).get("token") == self.token
+        except (OSError, ValueError):
+            return False
+
+    def _heartbeat(self):
+        while not self._stop.wait(self.heartbeat_interval):
+            if not self._owned():
+                print(f"[WARN] Lease lost: {self.path.name}")
+                self.lost = True
+                return
+            try:
+                os.utime(self.path)
+            except OSError:
+                self.lost = True
+                return
+
+    def release(self):
+        self._stop.set()
+        self._thread.join()
+        if self._owned():
+            self.path.unlink(missing_ok=True)
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.release()
+
+
+class LeaseManager:
+    def __init__(self, root="work/leases", node_id=None, ttl=120.0, heartbeat_interval=None,
+                 max_attempts=3):
+        self.root = Path(root)
+        self.max_attempts = max_attempts
+        self.root.mkdir(parents=True, exist_ok=True)
+        self.node_id = node_id or f"{socket.gethostname()}-{os.getpid()}"
+        self.ttl = ttl
+        self.heartbeat_interval = heartbeat_interval or max(0.05, ttl / 4)
+
+    def _name(self, video, stage):
+        return f"{Path(video).stem}.{stage}"
+
+    def lease_path(self, video, stage):
+        return self.root / f"{self._name(video, stage)}.lease"
+
+    def done_path(self, video, stage):
+        return self.root / f"{self._name(video, stage)}.done"
+
+    def failed_path(self, video, stage):
+        return self.root / f"{self._name(video, stage)}.failed"
+
+    def is_done(self, video, stage):
+        return self.done_path(video, stage).exists()
+
+    def attempts(self, video, stage):
+        """Failed runs recorded for (video, stage)."""
+        try:
+            return json.loads(self.failed_path(video, stage).read_text(encoding="utf-8"))["attempts"]
+        except (OSError, ValueError, KeyError):
+            return 0
+
+    def is_failed(self, video, stage):
+        """True once (video, stage) has failed ``max_attempts`` times."""
+        return self.attempts(video, stage) >= self.max_attempts
+
+    def record_failure(self, video, stage, error=None):
+        """Count a failed run (call while holding the lease); returns the attempts so far."""
+        attempts = self.attempts(video, stage) + 1
+        with atomic_open(self.failed_path(video, stage)) as f:
+            json.dump({"node": self.node_id, "failed_at": time.time(), "attempts": attempts,
+                       "error": error}, f)
+        return attempts
+
+    def mark_done(self, video, stage, **info):
+        with atomic_open(self.done_path(video, stage)) as f:
+            json.dump({"node": self.node_id, "finished_at": time.time(), **info}, f)
+        self.failed_path(video, stage).unlink(missing_ok=True)
+
+    def clear(self, video, stage=None):
+        """Forget done/failed markers so a video (or one stage of it) is processed again."""
+        for suffix in ("done", "failed"):
+            for p in self.root.glob(f"{Path(video).stem}.{stage or '*'}.{suffix}"):
+                p.unlink(missing_ok=True)
+
+    def _create(self, path):
+        token = uuid.uuid4().hex
+        fd = os.open(path, os.O_CREAT | os.O_EXCL | os.O_WRONLY, 0o644)
+        with os.fdopen(fd, "w", encoding="utf-8") as f:
+            json.dump({"node": self.node_id, "pid": os.getpid(), "token": token,
+                       "acquired_at": time.time()}, f)
+            f.flush()
+            os.fsync(f.fileno())
+        return Lease(path, token, self.node_id, self.heartbeat_interval)
+
+    def server_time(self):
+        """Current time on the shared storage: the mtime of a probe file touched just now."""
+        probe = self.root / f".clock.{self.node_id}"
+        probe.touch()
+        return probe.stat().st_mtime
+
+    def _reclaim_if_expired(self, path):
+        """Move an expired lease out of the way; returns True if the slot may be free."""
+        try:
+            st = path.stat()
+            stale_token = json.loads(path.read_text(encoding="utf-8")).get("token")
+        except FileNotFoundError:
+            return True
+        except ValueError:
+            # being written right now by its creator (or corrupt): judge by age only
+            stale_token = None
+        if self.server_time() - st.st_mtime < self.ttl:
+            return False
+
+        grave = path.with_name(f"{path.name}.expired.{uuid.uuid4().hex}")
+        try:
+            os.rename(path, grave)
+        except FileNotFoundError:
+            return True  # another node reclaimed it first
+        try:
+            moved_token = json.loads(grave.read_text(encoding="utf-8")).get("token")
+        except (OSError, ValueError):
+            moved_token = None
+        if stale_token is not None and moved_token != stale_token:
+            # Raced with a reclaimer that already created a fresh lease and we moved
+            # that one instead: put it back (link fails if the slot was retaken).
+            try:
+                os.link(grave, path)
+            except OSError:
+                pass
+            grave.unlink(missing_ok=True)
+            return False
+        print(f"♻️  Reclaimed expired lease {path.name}")
+        grave.unlink(missing_ok=True)
+        return True
+
+    def try_acquire(self, video, stage):
+        """Return a held Lease for (video, stage), or None if another live node has it."""
+        path = self.lease_path(video, stage)
+        for _ in range(2):
+            try:
+                return self._create(path)
+            except FileExistsError:
+                if not self._reclaim_if_expired(path):
+                    return None
+        return None
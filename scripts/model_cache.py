@@ -0,0 +1,24 @@
+"""Process-wide cache for loaded models.
+
+Stage classes are cheap, short-lived objects created per video. Anything
+expensive to load (Whisper, alignment, punctuation, MT models) goes through
+``get_model`` so a long-running process (``main.py --watch``) loads each
+model once and reuses it for every job. One-shot runs behave as before.
+"""
+
+_models = {}
+
+
+def get_model(key, loader):
+    """Return the cached model for ``key``, calling ``loader()`` on first use."""
+    if key not in _models:
+        _models[key] = loader()
+    return _models[key]
+
+
+def loaded_models():
+    return sorted(str(k) for k in _models)
+
+
+def clear_models():
+    _models.clear()
@@ -1,14 +1,20 @@
 import json, re, os, csv, hashlib
 from pathlib import Path
-import langid
-from transformers import AutoTokenizer, AutoModelForSeq2SeqLM
-import torch
+from model_cache import get_model
+from segment_store import SegmentReader, SegmentWriter
+from atomic_io import atomic_open
 
 class MachineTranslator:
-    def __init__(self, video_name):
+    def __init__(self, video_name, tier="full", min_mean_logprob=-1.0):
         self.video_name = video_name
-        self.pt_json = Path(f"work/stt/{Path(video_name).stem}_pt_clean.json")
-        self.out_json = Path(f"work/mt/{Path(video_name).stem}_en_segments.json")
+        self.tier = tier
+        # Adaptive decoding: greedy first, beam search (num_beams) only for
+        # segments whose mean token log-prob is below min_mean_logprob or whose
+        # output does not look English. The draft tier never escalates.
+        self.min_mean_logprob = min_mean_logprob
+        self.escalate_num_beams = None if tier == "draft" else 4
+        self.pt_json = Path(f"work/stt/{Path(video_name).stem}_pt_clean.jsonl")
+        self.out_json = Path(f"work/mt/{Path(video_name).stem}_en_segments.jsonl")
         self.out_srt = Path(f"work/mt/{Path(video_name).stem}_en.srt")
         self.out_log = Path(f"logs/{Path(video_name).stem}_mt_report.json")
         self.glossary = Path("glossary/terms.csv")
@@ -16,7 +22,9 @@ class MachineTranslator:
         os.makedirs("work/mt", exist_ok=True)
         os.makedirs("logs", exist_ok=True)
         
-        self.device = "cuda" if torch.cuda.is_available() else "cpu"
+        # torch/transformers/langid are imported lazily so that importing this
+        # module (e.g. from main.py) stays cheap; device is resolved in load_models()
+        self.device = None
         self.ip_re = re.compile(r"\b(\d{1,3}(?:\.\d{1,3}){3})(?:/(\d{1,2}))?\b")
         self.num_re = re.compile(r"\b\d+[\d\.,/]*\b")
         
@@ -27,9 +35,19 @@ class MachineTranslator:
         self.acronyms = None
 
     def load_models(self):
-        if self.tok_main is not None:
+        if self.acronyms is not None:
             return
-        
+        import torch
+        self.device = "cuda" if torch.cuda.is_available() else "cpu"
+
+        if self.tier == "draft":
+            # draft: Opus-MT only (fast, small), no NLLB and no fallbacks
+            self.tok_fb1, self.mod_fb1 = self._try_load("Helsinki-NLP/opus-mt-tc-big-pt-en")
+            if self.tok_fb1 is None:
+                raise RuntimeError("Failed to load Opus-MT for draft translation")
+            self.acronyms = self._load_glossary_upper()
+            return
+
         self.tok_main, self.mod_main = self._try_load("facebook/nllb-200-1.3B", {"use_fast": False})
         if self.tok_main is None:
             raise RuntimeError("Failed to load NLLB-200 1.3B")
@@ -40,8 +58,11 @@ class MachineTranslator:
         self.acronyms = self._load_glossary_upper()
 
     def _try_load(self, model_name, tok_kwargs=None):
+        import torch
+        from transformers import AutoTokenizer, AutoModelForSeq2SeqLM
         tok_kwargs = tok_kwargs or {}
-        try:
+
+        def load():
             tok = AutoTokenizer.from_pretrained(model_name, **tok_kwargs)
             mod = AutoModelForSeq2SeqLM.from_pretrained(
                 model_name,
@@ -49,6 +70,9 @@ class MachineTranslator:
             )
             mod.to(self.device).eval()
             return tok, mod
+
+        try:
+            return get_model(("seq2seq", model_name, self.device), load)
         except Exception as e:
             print(f"[WARN] Failed to load {model_name}: {e}")
             return None, None
@@ -106,123 +130,162 @@ class MachineTranslator:
         approx_tokens = max(8, int(pt_len / 4))
         return min(128, approx_tokens + 10)
 
-    def _translate_main_nllb(self, pt_text, target_tokens):
-        protected, placeholders = self._protect_entities(pt_text)
-        inputs = self.tok_main(protected, return_tensors="pt", truncation=True, max_length=512).to(self.device)
+    def _generate(self, tok, mod, inputs, num_beams, **gen_kwargs):
+        """Decode one input; returns (text, mean token log-prob).
+
+        The log-prob is computed for greedy decoding only (it drives the
+        beam-search escalation) and is None for beam search.
+        """
+        import torch
+        greedy = num_beams == 1
         with torch.inference_mode():
-            gen = self.mod_main.generate(
-                **inputs, forced_bos_token_id=self.en_id, num_beams=4,
-                length_penalty=1.1, max_new_tokens=target_tokens, no_repeat_ngram_size=3
+            gen = mod.generate(
+                **inputs, num_beams=num_beams, no_repeat_ngram_size=3,
+                output_scores=greedy, return_dict_in_generate=True, **gen_kwargs
             )
-        out = self.tok_main.decode(gen[0], skip_special_tokens=True)
-        return self._clean_punct(self._restore_entities(out, placeholders))
+            mean_logprob = None
+            if greedy:
+                scores = mod.compute_transition_scores(gen.sequences, gen.scores, normalize_logits=True)[0]
+                tokens = gen.sequences[0, -scores.shape[0]:]
+                mask = tokens != tok.pad_token_id
+                mean_logprob = float(scores[mask].mean()) if bool(mask.any()) else 0.0
+        return tok.decode(gen.sequences[0], skip_special_tokens=True), mean_logprob
 
-    def _translate_fb_opus(self, pt_text, target_tokens):
+    def _translate_main_nllb(self, pt_text, target_tokens, num_beams=4):
+        protected, placeholders = self._protect_entities(pt_text)
+        inputs = self.tok_main(protected, return_tensors="pt", truncation=True, max_length=512).to(self.device)
+        out, logprob = self._generate(
+            self.tok_main, self.mod_main, inputs, num_beams, forced_bos_token_id=self.en_id,
+            length_penalty=1.1, max_new_tokens=target_tokens
+        )
+        return self._clean_punct(self._restore_entities(out, placeholders)), logprob
+
+    def _translate_fb_opus(self, pt_text, target_tokens, num_beams=4):
         if self.tok_fb1 is None:
             raise RuntimeError("Opus-MT not available")
         protected, placeholders = self._protect_entities(pt_text)
         protected = ">>en<< " + protected
         inputs = self.tok_fb1(protected, return_tensors="pt", truncation=True, max_length=512).to(self.device)
-        with torch.inference_mode():
-            gen = self.mod_fb1.generate(
-                **inputs, num_beams=4, length_penalty=1.15,
-                max_new_tokens=target_tokens, no_repeat_ngram_size=3
-            )
-        out = self.tok_fb1.decode(gen[0], skip_special_tokens=True)
-        return self._clean_punct(self._restore_entities(out, placeholders))
+        out, logprob = self._generate(
+            self.tok_fb1, self.mod_fb1, inputs, num_beams, length_penalty=1.15,
+            max_new_tokens=target_tokens
+        )
+        return self._clean_punct(self._restore_entities(out, placeholders)), logprob
 
-    def _translate_fb_m2m(self, pt_text, target_tokens):
+    def _translate_fb_m2m(self, pt_text, target_tokens, num_beams=4):
         if self.tok_fb2 is None:
             raise RuntimeError("M2M100 not available")
         protected, placeholders = self._protect_entities(pt_text)
         self.tok_fb2.src_lang = "pt"
         inputs = self.tok_fb2(protected, return_tensors="pt", truncation=True, max_length=512).to(self.device)
         forced_bos = self.tok_fb2.get_lang_id("en")
-        with torch.inference_mode():
-            gen = self.mod_fb2.generate(
-                **inputs, forced_bos_token_id=forced_bos, num_beams=4,
-                length_penalty=1.15, max_new_tokens=target_tokens, no_repeat_ngram_size=3
-            )
-        out = self.tok_fb2.decode(gen[0], skip_special_tokens=True)
-        return self._clean_punct(self._restore_entities(out, placeholders))
+        out, logprob = self._generate(
+            self.tok_fb2, self.mod_fb2, inputs, num_beams, forced_bos_token_id=forced_bos,
+            length_penalty=1.15, max_new_tokens=target_tokens
+        )
+        return self._clean_punct(self._restore_entities(out, placeholders)), logprob
 
     def _to_srt_time(self, t):
         h = int(t//3600); m = int((t%3600)//60); s = t%60
         return f"{h:02d}:{m:02d}:{s:06.3f}".replace(".", ",")
 
+    def matched_acronyms(self, pt_text):
+        """Protected glossary acronyms occurring in a segment (recorded for glossary updates)."""
+        return [t for t in self.acronyms if re.search(rf"\b{re.escape(t)}\b", pt_text)]
+
+    def translate_segment(self, start, end, pt):
+        """Translate one PT segment; returns (segment record, report item)."""
+        import langid
+        dur = max(0.01, end - start)
+        pt_len = len(pt)
+
+        if not pt:
+            record = {
+                "start": start, "end": end, "pt_text": "", "en_text": "",
+                "len_ratio": 1.0, "lang": "en", "model": "none", "entities": []
+            }
+            item = {
+                "start": start, "end": end, "duration": dur, "pt_len": 0, "en_len": 0,
+                "len_ratio": 1.0, "lang": "en", "lang_score": 0.0,
+                "used_model": "none", "fallback_used": False,
+                "greedy_logprob": None, "escalated": False, "pt": "", "en": ""
+            }
+            return record, item
+
+        target_tokens = self._estimate_max_tokens(pt_len)
+        if self.tier == "draft":
+            translate, used_model = self._translate_fb_opus, "opus-mt-pt-en"
+        else:
+            translate, used_model = self._translate_main_nllb, "nllb-1.3B"
+        en, greedy_logprob = translate(pt, target_tokens, num_beams=1)
+        lang, score = langid.classify(en)
+        fallback_used = False
+
+        escalated = bool(self.escalate_num_beams) and (
+            (greedy_logprob is not None and greedy_logprob < self.min_mean_logprob)
+            or not self._is_english_like(en, lang, score)
+        )
+        if escalated:
+            en, _ = translate(pt, target_tokens, num_beams=self.escalate_num_beams)
+            lang, score = langid.classify(en)
+
+        if not self._is_english_like(en, lang, score) and self.tok_fb1 and self.tier != "draft":
+            try:
+                en_fb, _ = self._translate_fb_opus(pt, target_tokens)
+                lang2, score2 = langid.classify(en_fb)
+                if self._is_english_like(en_fb, lang2, score2):
+                    en, lang, score = en_fb, lang2, score2
+                    used_model, fallback_used = "opus-mt-pt-en", True
+            except Exception as e:
+                print(f"[WARN] Opus-MT fallback failed: {e}")
+
+        if not self._is_english_like(en, lang, score) and self.tok_fb2:
+            try:
+                en_fb2, _ = self._translate_fb_m2m(pt, target_tokens)
+                lang3, score3 = langid.classify(en_fb2)
+                if self._is_english_like(en_fb2, lang3, score3):
+                    en, lang, score = en_fb2, lang3, score3
+                    used_model, fallback_used = "m2m100_418M", True
+            except Exception as e:
+                print(f"[WARN] M2M100 fallback failed: {e}")
+
+        en_len = len(en)
+        len_ratio = (en_len + 1) / (pt_len + 1)
+
+        record = {
+            "start": start, "end": end, "pt_text": pt, "en_text": en,
+            "len_ratio": float(len_ratio), "lang": lang, "model": used_model,
+            "entities": self.matched_acronyms(pt)
+        }
+        item = {
+            "start": start, "end": end, "duration": dur,
+            "pt_len": pt_len, "en_len": en_len, "len_ratio": round(len_ratio, 3),
+            "lang": lang, "lang_score": round(float(score), 3),
+            "used_model": used_model, "fallback_used": fallback_used,
+            "greedy_logprob": round(greedy_logprob, 3) if greedy_logprob is not None else None,
+            "escalated": escalated, "pt": pt, "en": en
+        }
+        return record, item
+
     def process(self):
         self.load_models()
-        
-        data = json.load(open(self.pt_json, "r", encoding="utf-8"))
-        segments = data.get("segments", [])
-        out = {"segments": []}
+
         report = []
+        n_escalated = 0
+        # the acronym list is kept in the header so a glossary update can tell
+        # which protected entities were added or removed since this run
+        meta = {"tier": self.tier, "acronyms": self.acronyms}
+        with SegmentWriter(self.out_json, meta) as out, atomic_open(self.out_srt) as srt:
+            for i, seg in enumerate(SegmentReader(self.pt_json), 1):
+                start, end = float(seg["start"]), float(seg["end"])
+                pt = (seg.get("text") or "").strip()
+                record, item = self.translate_segment(start, end, pt)
+                n_escalated += item["escalated"]
+                out.append(record)
+                report.append(item)
+                srt.write(f"{i}\n{self._to_srt_time(start)} --> {self._to_srt_time(end)}\n{record['en_text']}\n\n")
 
-        for seg in segments:
-            start, end = float(seg["start"]), float(seg["end"])
-            pt = (seg.get("text") or "").strip()
-            dur = max(0.01, end - start)
-            pt_len = len(pt)
-
-            if not pt:
-                out["segments"].append({
-                    "start": start, "end": end, "pt_text": "", "en_text": "",
-                    "len_ratio": 1.0, "lang": "en", "model": "none"
-                })
-                report.append({
-                    "start": start, "end": end, "duration": dur, "pt_len": 0, "en_len": 0,
-                    "len_ratio": 1.0, "lang": "en", "lang_score": 0.0,
-                    "used_model": "none", "fallback_used": False, "pt": "", "en": ""
-                })
-                continue
-
-            target_tokens = self._estimate_max_tokens(pt_len)
-            en = self._translate_main_nllb(pt, target_tokens)
-            lang, score = langid.classify(en)
-            used_model = "nllb-1.3B"
-            fallback_used = False
-
-            if not self._is_english_like(en, lang, score) and self.tok_fb1:
-                try:
-                    en_fb = self._translate_fb_opus(pt, target_tokens)
-                    lang2, score2 = langid.classify(en_fb)
-                    if self._is_english_like(en_fb, lang2, score2):
-                        en, lang, score = en_fb, lang2, score2
-                        used_model, fallback_used = "opus-mt-pt-en", True
-                except Exception as e:
-                    print(f"[WARN] Opus-MT fallback failed: {e}")
-
-            if not self._is_english_like(en, lang, score) and self.tok_fb2:
-                try:
-                    en_fb2 = self._translate_fb_m2m(pt, target_tokens)
-                    lang3, score3 = langid.classify(en_fb2)
-                    if self._is_english_like(en_fb2, lang3, score3):
-                        en, lang, score = en_fb2, lang3, score3
-                        used_model, fallback_used = "m2m100_418M", True
-                except Exception as e:
-                    print(f"[WARN] M2M100 fallback failed: {e}")
-
-            en_len = len(en)
-            len_ratio = (en_len + 1) / (pt_len + 1)
-
-            report.append({
-                "start": start, "end": end, "duration": dur,
-                "pt_len": pt_len, "en_len": en_len, "len_ratio": round(len_ratio, 3),
-                "lang": lang, "lang_score": round(float(score), 3),
-                "used_model": used_model, "fallback_used": fallback_used,
-                "pt": pt, "en": en
-            })
-
-            out["segments"].append({
-                "start": start, "end": end, "pt_text": pt, "en_text": en,
-                "len_ratio": float(len_ratio), "lang": lang, "model": used_model
-            })
-
-        json.dump(out, open(self.out_json, "w", encoding="utf-8"), ensure_ascii=False, indent=2)
-        json.dump(report, open(self.out_log, "w", encoding="utf-8"), ensure_ascii=False, indent=2)
-
-        with open(self.out_srt, "w", encoding="utf-8") as f:
-            for i, s in enumerate(out["segments"], 1):
-                f.write(f"{i}\n{self._to_srt_time(s['start'])} --> {self._to_srt_time(s['end'])}\n{s['en_text']}\n\n")
-
-        print(f"OK: {self.out_json}, {self.out_srt} | Report: {self.out_log}")
+        with atomic_open(self.out_log) as f:
+            json.dump(report, f, ensure_ascii=False, indent=2)
+
+        print(f"OK: {self.out_json}, {self.out_srt} | {n_escalated}/{len(report)} segments escalated to beam search | Report: {self.out_log}")
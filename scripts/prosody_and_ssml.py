@@ -1,16 +1,19 @@
 import json, os, numpy as np
 from pathlib import Path
-import librosa, pyworld as pw
+from segment_store import SegmentReader, SegmentWriter
+from atomic_io import atomic_open
+from speech_regions import SpeechRegions
 
 class ProsodySSMLGenerator:
     def __init__(self, video_name):
         self.video_name = video_name
         self.audio = Path(f"work/audio/{Path(video_name).stem}_clean.wav")
-        self.words_json = Path(f"work/stt/{Path(video_name).stem}_words_aligned.json")
-        self.mt_json = Path(f"work/mt/{Path(video_name).stem}_en_segments.json")
-        self.out_json = Path(f"work/ssml/{Path(video_name).stem}_en_ssml.json")
+        self.words_json = Path(f"work/stt/{Path(video_name).stem}_words_aligned.jsonl")
+        self.mt_json = Path(f"work/mt/{Path(video_name).stem}_en_segments.jsonl")
+        self.out_json = Path(f"work/ssml/{Path(video_name).stem}_en_ssml.jsonl")
         self.out_srt = Path(f"work/ssml/{Path(video_name).stem}_en_ssml_preview.srt")
         self.out_log = Path(f"logs/{Path(video_name).stem}_ssml_report.json")
+        self.regions_path = Path(f"work/audio/{Path(video_name).stem}_speech_regions.json")
         
         os.makedirs(self.out_json.parent, exist_ok=True)
         os.makedirs(self.out_log.parent, exist_ok=True)
@@ -19,8 +22,13 @@ class ProsodySSMLGenerator:
         self.sr = 16000
         self.frame_len = 0.02
         self.hop_len = None
+        self.regions = None
 
     def _segment_audio(self, start, end):
+        # With a speech-region index, silent stretches inside the segment are
+        # dropped so F0 extraction only runs over speech.
+        if self.regions is not None:
+            return self.regions.slice_speech(self.y, self.sr, start, end)
         s = max(0, int(start * self.sr))
         e = min(len(self.y), int(end * self.sr))
         return self.y[s:e]
@@ -48,6 +56,7 @@ class ProsodySSMLGenerator:
     def _compute_f0(self, sig):
         if len(sig) < self.sr * 0.15:
             return None
+        import pyworld as pw
         _f0, t = pw.harvest(sig.astype(np.float64), self.sr, f0_floor=50.0, f0_ceil=300.0)
         f0 = pw.stonemask(sig.astype(np.float64), _f0, t, self.sr)
         f0 = f0[f0 > 1.0]
@@ -94,85 +103,90 @@ class ProsodySSMLGenerator:
             return en_tokens_len
         return int(round((pt_idx / (words_len - 1)) * max(0, en_tokens_len - 1)))
 
+    def _pauses(self, words):
+        pauses = []
+        for j in range(1, len(words)):
+            prev_end = float(words[j-1]["end"])
+            cur_start = float(words[j]["start"])
+            gap = cur_start - prev_end
+            q = self._quantize_pause(gap)
+            if q:
+                pauses.append({"after_index": j-1, "dur": q})
+        return pauses
+
+    def _pitch_ssml(self, pitch_cat):
+        if pitch_cat == "question":
+            return "+2st"
+        if pitch_cat == "emphasis":
+            return "+1st"
+        if pitch_cat == "statement":
+            return "-1st"
+        return "0st"
+
+    def build_ssml(self, en_text, words, rate_pct, pitch_cat):
+        """SSML for one segment; needs no audio, so glossary updates can rebuild it."""
+        pauses = self._pauses(words)
+        en_tokens = en_text.split()
+        ssml_parts = []
+        token_cursor = 0
+
+        for p in pauses:
+            en_idx = self._ptidx_to_enidx(p["after_index"], len(words), len(en_tokens))
+            ssml_parts.append(" ".join(en_tokens[token_cursor:en_idx+1]))
+            ssml_parts.append(f'<break time="{int(p["dur"]*1000)}ms"/>')
+            token_cursor = en_idx + 1
+
+        if token_cursor < len(en_tokens):
+            ssml_parts.append(" ".join(en_tokens[token_cursor:]))
+
+        base_text_with_breaks = " ".join([s for s in ssml_parts if s])
+        rate_str = f"{rate_pct}%" if rate_pct >= 0 else f"{rate_pct}%"
+        return f'<prosody rate="{rate_str}" pitch="{self._pitch_ssml(pitch_cat)}">{base_text_with_breaks}</prosody>'
+
+    def preview(self, ssml):
+        return ssml.replace("<prosody", "[prosody").replace("</prosody>", "[/prosody]").replace('<break time="', "[pause:").replace('"/>', "ms]")
+
     def process(self):
-        aligned = json.load(open(self.words_json, "r", encoding="utf-8"))
-        en_map = json.load(open(self.mt_json, "r", encoding="utf-8"))
-        pt_segments = aligned["segments"]
-        en_segments = en_map["segments"]
-        
+        import librosa
+        pt_segments = SegmentReader(self.words_json)
+        en_segments = SegmentReader(self.mt_json)
+
         assert len(pt_segments) == len(en_segments), "PT and EN segmentation length mismatch"
         
         self.y, self.sr = librosa.load(str(self.audio), sr=16000, mono=True)
         self.hop_len = int(self.sr * self.frame_len)
+        self.regions = SpeechRegions.load(self.regions_path)
         
-        out_segments = []
         report = []
-        
-        for i, (pt, en) in enumerate(zip(pt_segments, en_segments), start=1):
-            start, end = float(pt["start"]), float(pt["end"])
-            words = pt.get("words") or []
-            en_text = en["en_text"]
-            dur = max(0.01, end - start)
-            
-            pauses = []
-            for j in range(1, len(words)):
-                prev_end = float(words[j-1]["end"])
-                cur_start = float(words[j]["start"])
-                gap = cur_start - prev_end
-                q = self._quantize_pause(gap)
-                if q:
-                    pauses.append({"after_index": j-1, "dur": q})
+        with SegmentWriter(self.out_json) as out, atomic_open(self.out_srt) as srt:
+            for i, (pt, en) in enumerate(zip(pt_segments, en_segments), start=1):
+                start, end = float(pt["start"]), float(pt["end"])
+                words = pt.get("words") or []
+                en_text = en["en_text"]
+                dur = max(0.01, end - start)
             
-            wps = self._estimate_wps(words, start, end)
-            rate_pct = self._classify_rate(wps)
+                pauses = self._pauses(words)
+                wps = self._estimate_wps(words, start, end)
+                rate_pct = self._classify_rate(wps)
             
-            sig = self._segment_audio(start, end)
-            pitch_cat = self._classify_pitch_trend(sig)
+                sig = self._segment_audio(start, end)
+                pitch_cat = self._classify_pitch_trend(sig)
+                ssml = self.build_ssml(en_text, words, rate_pct, pitch_cat)
             
-            if pitch_cat == "question":
-                pitch_ssml = "+2st"
-            elif pitch_cat == "emphasis":
-                pitch_ssml = "+1st"
-            elif pitch_cat == "statement":
-                pitch_ssml = "-1st"
-            else:
-                pitch_ssml = "0st"
+                out.append({
+                    "start": start, "end": end, "en_text": en_text, "ssml": ssml,
+                    "wps_pt": wps, "rate_pct": rate_pct, "pitch_cat": pitch_cat,
+                    "pauses_count": len(pauses)
+                })
+                srt.write(f"{i}\n{self._to_srt_time(start)} --> {self._to_srt_time(end)}\n{self.preview(ssml)}\n\n")
             
-            en_tokens = en_text.split()
-            ssml_parts = []
-            token_cursor = 0
-            
-            for p in pauses:
-                en_idx = self._ptidx_to_enidx(p["after_index"], len(words), len(en_tokens))
-                ssml_parts.append(" ".join(en_tokens[token_cursor:en_idx+1]))
-                ssml_parts.append(f'<break time="{int(p["dur"]*1000)}ms"/>')
-                token_cursor = en_idx + 1
-            
-            if token_cursor < len(en_tokens):
-                ssml_parts.append(" ".join(en_tokens[token_cursor:]))
-            
-            base_text_with_breaks = " ".join([s for s in ssml_parts if s])
-            rate_str = f"{rate_pct}%" if rate_pct >= 0 else f"{rate_pct}%"
-            ssml = f'<prosody rate="{rate_str}" pitch="{pitch_ssml}">{base_text_with_breaks}</prosody>'
-            
-            out_segments.append({
-                "start": start, "end": end, "en_text": en_text, "ssml": ssml,
-                "wps_pt": wps, "rate_pct": rate_pct, "pitch_cat": pitch_cat,
-                "pauses_count": len(pauses)
-            })
-            
-            report.append({
-                "idx": i, "start": start, "end": end, "dur": dur,
-                "wps_pt": round(wps, 2), "rate_pct": rate_pct,
-                "pitch_cat": pitch_cat, "pauses": pauses[:8]
-            })
-        
-        json.dump({"segments": out_segments}, open(self.out_json, "w", encoding="utf-8"), ensure_ascii=False, indent=2)
-        json.dump(report, open(self.out_log, "w", encoding="utf-8"), ensure_ascii=False, indent=2)
-        
-        with open(self.out_srt, "w", encoding="utf-8") as f:
-            for idx, s in enumerate(out_segments, 1):
-                preview = s["ssml"].replace("<prosody", "[prosody").replace("</prosody>", "[/prosody]").replace('<break time="', "[pause:").replace('"/>', "ms]")
-                f.write(f"{idx}\n{self._to_srt_time(s['start'])} --> {self._to_srt_time(s['end'])}\n{preview}\n\n")
-        
+                report.append({
+                    "idx": i, "start": start, "end": end, "dur": dur,
+                    "wps_pt": round(wps, 2), "rate_pct": rate_pct,
+                    "pitch_cat": pitch_cat, "pauses": pauses[:8]
+                })
+
+        with atomic_open(self.out_log) as f:
+            json.dump(report, f, ensure_ascii=False, indent=2)
+
         print(f"OK: {self.out_json}, {self.out_srt} | Report: {self.out_log}")
@@ -1,11 +1,36 @@
-import json, re, csv, yaml, os, sys
+import re, csv, yaml, os, sys
 from pathlib import Path
+from model_cache import get_model
+from segment_store import SegmentReader, SegmentWriter
+from atomic_io import atomic_open
+
+def read_terms(glossary_csv):
+    """Glossary rows as dicts ``{"find", "replace", "flags"}``, in file order."""
+    terms = []
+    if Path(glossary_csv).exists():
+        with open(glossary_csv, newline="", encoding="utf-8") as f:
+            r = csv.DictReader(f, fieldnames=["find","replace","flags"])
+            for row in r:
+                find = (row["find"] or "").strip()
+                if not find:
+                    continue
+                terms.append({
+                    "find": find,
+                    "replace": (row["replace"] or "").strip(),
+                    "flags": (row.get("flags") or "").strip().lower(),
+                })
+    return terms
 
 class PortuguesePostProcessor:
-    def __init__(self, video_name):
+    def __init__(self, video_name, tier="full"):
         self.video_name = video_name
-        self.in_json = Path(f"work/stt/{Path(video_name).stem}_words_aligned.json")
-        self.out_json = Path(f"work/stt/{Path(video_name).stem}_pt_clean.json")
+        self.tier = tier
+        # draft tier skips word alignment and reads the raw STT segments
+        if tier == "draft":
+            self.in_json = Path(f"work/stt/{Path(video_name).stem}_stt.jsonl")
+        else:
+            self.in_json = Path(f"work/stt/{Path(video_name).stem}_words_aligned.jsonl")
+        self.out_json = Path(f"work/stt/{Path(video_name).stem}_pt_clean.jsonl")
         self.out_srt = Path(f"work/stt/{Path(video_name).stem}_pt_clean.srt")
         self.glossary_csv = Path("glossary/terms.csv")
         self.itn_yaml = Path("glossary/itn_rules.yaml")
@@ -19,60 +44,53 @@ class PortuguesePostProcessor:
         self.LT_SERVER = "http://localhost:8081"
         try:
             import language_tool_python
-            self.tool = language_tool_python.LanguageToolPublicAPI("pt-BR", self.LT_SERVER)
+            self.tool = get_model(
+                ("languagetool", self.LT_SERVER),
+                lambda: language_tool_python.LanguageToolPublicAPI("pt-BR", self.LT_SERVER),
+            )
             self.USE_LT = True
         except Exception:
             print("[INFO] LanguageTool não está ativo; seguindo sem LT local.")
 
     def process(self):
+        terms = read_terms(self.glossary_csv)
         subs = self.read_glossary(self.glossary_csv)
-        data = json.load(open(self.in_json, "r", encoding="utf-8"))
-        cleaned_segments = []
-
-        for seg in data["segments"]:
-            raw = seg["text"]
-            txt = self.restore_punctuation(raw)
-            if not self.USE_PUNCTUATOR:
-                txt = self.basic_truecase(txt)
-
-            txt = self.normalize_ips(txt)
-            txt = self.normalize_numbers_units(txt)
-            txt = self.apply_glossary(txt, subs)
-            txt = self.lt_fix(txt)
-
-            new_seg = {
-                "start": seg["start"],
-                "end": seg["end"],
-                "text": txt.strip(),
-                "words": seg.get("words", [])
-            }
-            cleaned_segments.append(new_seg)
-
         os.makedirs("work/stt", exist_ok=True)
-        json.dump({"segments": cleaned_segments}, open(self.out_json, "w", encoding="utf-8"), ensure_ascii=False, indent=2)
-
         lines = []
-        for seg in cleaned_segments:
-            words = seg.get("words") or []
-            if words:
-                lines.extend(self.split_for_srt(words))
-            else:
-                lines.append({"start": seg["start"], "end": seg["end"], "text": seg["text"]})
+        # glossary snapshot + per-segment pre-glossary text and matched terms:
+        # the glossary-impact index used by GlossaryUpdater
+        with SegmentWriter(self.out_json, {"glossary": terms}) as out:
+            for seg in SegmentReader(self.in_json):
+                raw = seg["text"]
+                txt = self.restore_punctuation(raw)
+                if not self.USE_PUNCTUATOR:
+                    txt = self.basic_truecase(txt)
+
+                txt = self.normalize_ips(txt)
+                txt = self.normalize_numbers_units(txt)
+                pre_glossary, hits = txt, []
+                txt = self.apply_glossary(txt, subs, hits)
+                txt = self.lt_fix(txt)
+
+                new_seg = {
+                    "start": seg["start"],
+                    "end": seg["end"],
+                    "text": txt.strip(),
+                    "words": seg.get("words", []),
+                    "pre_glossary": pre_glossary,
+                    "glossary_hits": [terms[k]["find"] for k in hits]
+                }
+                out.append(new_seg)
+                lines.extend(self.srt_lines(new_seg))
 
         self.write_srt(lines, self.out_srt)
         print("OK:", self.out_json, self.out_srt)
 
     def read_glossary(self, glossary_csv):
         subs = []
-        if Path(glossary_csv).exists():
-            with open(glossary_csv, newline="", encoding="utf-8") as f:
-                r = csv.DictReader(f, fieldnames=["find","replace","flags"])
-                for row in r:
-                    find = row["find"].strip()
-                    repl = row["replace"].strip()
-                    flags = (row.get("flags") or "").strip().lower()
-                    re_flags = re.IGNORECASE if "i" in flags else 0
-                    subs.append((re.compile(re.escape(find), re_flags), repl))
+        for term in read_terms(glossary_csv):
+            re_flags = re.IGNORECASE if "i" in term["flags"] else 0
+            subs.append((re.compile(re.escape(term["find"]), re_flags), term["replace"]))
         return subs
 
     def normalize_numbers_units(self, text):
@@ -91,7 +109,7 @@ class PortuguesePostProcessor:
             try:
                 if self.punct_model is None:
                     from deepmultilingualpunctuation import PunctuationModel
-                    self.punct_model = PunctuationModel()
+                    self.punct_model = get_model("punctuation", PunctuationModel)
                 return self.punct_model.restore_punctuation(text)
             except Exception as e:
                 print(f"[WARN] Punctuation restoration failed: {e}")
@@ -102,9 +120,12 @@ class PortuguesePostProcessor:
     def basic_truecase(self, text):
         return text.capitalize()
 
-    def apply_glossary(self, text, subs):
-        for pattern, repl in subs:
-            text = pattern.sub(repl, text)
+    def apply_glossary(self, text, subs, hits=None):
+        # hits (optional) collects the indexes of the entries that matched
+        for k, (pattern, repl) in enumerate(subs):
+            text, n = pattern.subn(repl, text)
+            if n and hits is not None:
+                hits.append(k)
         return text
 
     def lt_fix(self, text):
@@ -117,6 +138,11 @@ class PortuguesePostProcessor:
                 pass
         return text
 
+    def srt_lines(self, seg):
+        if seg.get("words"):
+            return self.split_for_srt(seg["words"])
+        return [{"start": seg["start"], "end": seg["end"], "text": seg["text"]}]
+
     def split_for_srt(self, words, max_chars=42, max_duration=5.0, min_duration=1.0):
         lines, cur, cur_start = [], [], None
         for w in words:
@@ -140,6 +166,6 @@ class PortuguesePostProcessor:
         return f"{h:02d}:{m:02d}:{s:06.3f}".replace(".", ",")
 
     def write_srt(self, lines, path):
-        with open(path, "w", encoding="utf-8") as f:
+        with atomic_open(path) as f:
             for i, l in enumerate(lines, 1):
                 f.write(f"{i}\n{self.to_srt_time(l['start'])} --> {self.to_srt_time(l['end'])}\n{l['text']}\n\n")
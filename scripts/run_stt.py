@@ -1,46 +1,130 @@
 import json, os
 from pathlib import Path
+from model_cache import get_model
+from segment_store import SegmentWriter
+from speech_regions import SpeechRegions
+from atomic_io import atomic_open
 
 class SpeechToText:
-    def __init__(self, video_name):
+    def __init__(self, video_name, tier="full", min_avg_logprob=-0.8, max_no_speech_prob=0.6):
         self.video_name = video_name
+        self.tier = tier
         self.audio_path = f"work/audio/{Path(video_name).stem}_clean.wav"
-        self.output_path = f"work/stt/{Path(video_name).stem}_stt.json"
-        self.model_name = "large-v3"
-        self.device = "cuda"
+        self.output_path = f"work/stt/{Path(video_name).stem}_stt.jsonl"
+        self.regions_path = f"work/audio/{Path(video_name).stem}_speech_regions.json"
+        self.out_log = f"logs/{Path(video_name).stem}_stt_report.json"
+        # draft: small model + greedy decoding for fast first subtitles
+        self.model_name = "small" if tier == "draft" else "large-v3"
+        # Adaptive decoding: everything is decoded greedily first; in the full
+        # tier, segments below these confidence thresholds are re-decoded with
+        # beam search.
+        self.escalate_beam_size = None if tier == "draft" else 5
+        self.min_avg_logprob = min_avg_logprob
+        self.max_no_speech_prob = max_no_speech_prob
+        # resolved in process() from the available hardware (the draft tier
+        # is meant for CPU-only machines)
+        self.device = None
+        self.compute_type = None
+
+    def _needs_escalation(self, seg):
+        return seg.avg_logprob < self.min_avg_logprob or seg.no_speech_prob > self.max_no_speech_prob
+
+    def _redecode(self, model, audio, seg):
+        """Beam-search re-decode of one segment; returns (text, avg_logprob) or None."""
+        clip = audio[int(seg.start * 16000):int(seg.end * 16000)]
+        if len(clip) < 1600:
+          return None
+        parts, _ = model.transcribe(
+          clip,
+          language="pt",
+          vad_filter=False,
+          beam_size=self.escalate_beam_size,
+          temperature=0.0,
+          word_timestamps=False,
+          condition_on_previous_text=False,
+        )
+        parts = list(parts)
+        if not parts:
+          return None
+        text = " ".join(p.text.strip() for p in parts).strip()
+        avg_logprob = sum(p.avg_logprob for p in parts) / len(parts)
+        return text, avg_logprob
+
+    def resolve_device(self):
+        import ctranslate2
+        self.device = "cuda" if ctranslate2.get_cuda_device_count() > 0 else "cpu"
         self.compute_type = "float16" if self.device=="cuda" else "int8"
 
     def process(self):
-        from faster_whisper import WhisperModel
-        
-        model = WhisperModel(self.model_name, device=self.device, compute_type=self.compute_type)
+        from faster_whisper import WhisperModel, decode_audio
+
+        self.resolve_device()
+        model = get_model(
+          ("faster-whisper", self.model_name, self.device, self.compute_type),
+          lambda: WhisperModel(self.model_name, device=self.device, compute_type=self.compute_type),
+        )
+
+        # Only the speech regions found by AudioExtractor are decoded; timestamps
+        # are mapped back to the original timeline below.
+        audio = decode_audio(self.audio_path, sampling_rate=16000)
+        regions = SpeechRegions.load(self.regions_path)
+        if regions is not None and regions.regions:
+          audio = regions.compact(audio, 16000)
+          to_original, to_original_end = regions.to_original, regions.to_original_end
+          print(f"STT em {regions.speech_duration:.1f}s de fala de {regions.duration:.1f}s "
+                f"({regions.speech_ratio:.0%})")
+        else:
+          to_original = to_original_end = lambda t: t
 
         segments, info = model.transcribe(
-          self.audio_path,
+          audio,
           language="pt",
           vad_filter=True,
-          beam_size=5,
+          beam_size=1,
           temperature=0.0,
           word_timestamps=False,
         )
 
-        out_segments = []
-        for seg in segments:
-          out_segments.append({
-            "start": seg.start,
-            "end": seg.end,
-            "text": seg.text.strip(),
-            "avg_logprob": seg.avg_logprob,
-            "no_speech_prob": seg.no_speech_prob,
-            "words": []
-          })
-
+        # segments is a lazy generator: stream each decoded segment straight to disk
         os.makedirs("work/stt", exist_ok=True)
-        with open(self.output_path, "w", encoding="utf-8") as f:
+        duration = regions.duration if regions is not None and regions.regions else info.duration
+        meta = {"language": info.language, "duration": duration, "model": self.model_name, "tier": self.tier}
+        escalated, total = [], 0
+        with SegmentWriter(self.output_path, meta) as out:
+          for i, seg in enumerate(segments):
+            total += 1
+            text, avg_logprob, was_escalated = seg.text.strip(), seg.avg_logprob, False
+            if self.escalate_beam_size and self._needs_escalation(seg):
+              was_escalated = True
+              beam = self._redecode(model, audio, seg)
+              kept = "greedy"
+              if beam is not None and beam[1] >= seg.avg_logprob:
+                text, avg_logprob = beam
+                kept = "beam"
+              escalated.append({
+                "idx": i, "start": to_original(seg.start), "end": to_original_end(seg.end),
+                "greedy_logprob": round(seg.avg_logprob, 3),
+                "beam_logprob": round(beam[1], 3) if beam else None,
+                "no_speech_prob": round(seg.no_speech_prob, 3), "kept": kept,
+              })
+            out.append({
+              "start": to_original(seg.start),
+              "end": to_original_end(seg.end),
+              "text": text,
+              "avg_logprob": avg_logprob,
+              "no_speech_prob": seg.no_speech_prob,
+              "escalated": was_escalated,
+              "words": []
+            })
+
+        os.makedirs("logs", exist_ok=True)
+        with atomic_open(self.out_log) as f:
           json.dump({
-            "language": info.language,
-            "duration": info.duration,
-            "model": self.model_name,
-            "segments": out_segments
+            "model": self.model_name, "tier": self.tier,
+            "thresholds": {"min_avg_logprob": self.min_avg_logprob,
+                           "max_no_speech_prob": self.max_no_speech_prob,
+                           "escalate_beam_size": self.escalate_beam_size},
+            "segments": total, "escalated": len(escalated),
+            "escalated_segments": escalated,
           }, f, ensure_ascii=False, indent=2)
-        print(f"OK: {self.output_path} gerado")
+        print(f"OK: {self.output_path} gerado | {len(escalated)}/{total} segmentos com beam search | Report: {self.out_log}")
@@ -1,12 +1,16 @@
-import json, os
+import os
 from pathlib import Path
+from model_cache import get_model
+from segment_store import SegmentReader, SegmentWriter
+from speech_regions import SpeechRegions
 
 class WhisperXAlign:
     def __init__(self, video_name):
         self.video_name = video_name
         self.audio_path = f"work/audio/{Path(video_name).stem}_clean.wav"
-        self.stt_json_path = f"work/stt/{Path(video_name).stem}_stt.json"
-        self.output_path = f"work/stt/{Path(video_name).stem}_words_aligned.json"
+        self.stt_json_path = f"work/stt/{Path(video_name).stem}_stt.jsonl"
+        self.output_path = f"work/stt/{Path(video_name).stem}_words_aligned.jsonl"
+        self.regions_path = f"work/audio/{Path(video_name).stem}_speech_regions.json"
         self.batch_size = 16
 
     def process(self):
@@ -14,21 +18,32 @@ class WhisperXAlign:
         
         self.device = "cuda" if torch.cuda.is_available() else "cpu"
         # 1) Carrega segmentos do Faster-Whisper
-        data = json.load(open(self.stt_json_path,"r",encoding="utf-8"))
-        segments = [{"start": s["start"], "end": s["end"], "text": s["text"]} for s in data["segments"]]
+        stt = SegmentReader(self.stt_json_path)
+        segments = [{"start": s["start"], "end": s["end"], "text": s["text"]} for s in stt]
+
+        # Janela de alinhamento de cada segmento limitada às regiões de fala
+        regions = SpeechRegions.load(self.regions_path)
+        if regions is not None:
+            for seg in segments:
+                speech = regions.overlapping(seg["start"], seg["end"])
+                if speech:
+                    seg["start"], seg["end"] = speech[0][0], speech[-1][1]
 
         # 2) Carrega modelo de alinhamento
-        model_a, metadata = whisperx.load_align_model(language_code="pt", device=self.device)
+        model_a, metadata = get_model(
+            ("whisperx-align", "pt", self.device),
+            lambda: whisperx.load_align_model(language_code="pt", device=self.device),
+        )
 
-        # 3) Realiza alinhamento
-        result_aligned = whisperx.align(segments, model_a, metadata, self.audio_path, self.device, return_char_alignments=False)
+        # 3) Realiza alinhamento (áudio carregado uma vez e reutilizado por segmento)
+        audio = whisperx.load_audio(self.audio_path)
+        result_aligned = whisperx.align(segments, model_a, metadata, audio, self.device, return_char_alignments=False)
 
         # 4) Mescla de volta no JSON
-        for s, a in zip(data["segments"], result_aligned["segments"]):
-            s["words"] = a.get("words", [])
-
         os.makedirs("work/stt", exist_ok=True)
-        with open(self.output_path,"w",encoding="utf-8") as f:
-            json.dump(data, f, ensure_ascii=False, indent=2)
+        with SegmentWriter(self.output_path, stt.meta) as out:
+            for s, a in zip(stt, result_aligned["segments"]):
+                s["words"] = a.get("words", [])
+                out.append(s)
 
         print(f"OK: {self.output_path} gerado")
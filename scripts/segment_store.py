@@ -0,0 +1,246 @@
+"""Streaming segment store used for the intermediate files between stages.
+
+Format (``*.jsonl``): the first line is a header ``{"_header": {...}}`` with
+the document-level fields (language, duration, model, ...); every following
+line is one compact JSON segment. A binary sidecar ``<file>.idx`` holds the
+byte offset of every segment (uint64, little endian) followed by the file
+size it was built for, giving O(1) random access by segment index. A stale
+or missing index is rebuilt with one sequential scan.
+
+Segments can be written incrementally (``SegmentWriter.append``) and read
+incrementally (iterating a ``SegmentReader``) without ever holding the
+whole document in memory. A new file is written under a temp name and
+renamed into place on close, so readers never see a partial file.
+
+For compatibility, ``SegmentReader`` falls back to the legacy indented
+``{"segments": [...]}`` JSON file with the same stem, and this module can
+convert between both formats:
+
+    python scripts/segment_store.py to-jsonl work/stt/video_stt.json
+    python scripts/segment_store.py to-json work/stt/video_stt.jsonl
+"""
+import argparse, json, os, sys
+from array import array
+from pathlib import Path
+
+from atomic_io import atomic_open, temp_path_for
+
+HEADER_KEY = "_header"
+FORMAT = "segments-jsonl"
+VERSION = 1
+
+
+def _dumps(obj):
+    return json.dumps(obj, ensure_ascii=False, separators=(",", ":"))
+
+
+def index_path(path):
+    path = Path(path)
+    return path.with_name(path.name + ".idx")
+
+
+def _write_index(path, offsets, size):
+    idx = array("Q", offsets)
+    idx.append(size)
+    if sys.byteorder != "little":
+        idx.byteswap()
+    with atomic_open(index_path(path), "wb") as f:
+        idx.tofile(f)
+
+
+def _read_index(path):
+    """Return the segment offsets if the sidecar index matches the file, else None."""
+    ipath = index_path(path)
+    if not ipath.exists():
+        return None
+    idx = array("Q")
+    with open(ipath, "rb") as f:
+        idx.frombytes(f.read())
+    if sys.byteorder != "little":
+        idx.byteswap()
+    if not idx or idx[-1] != os.path.getsize(path):
+        return None
+    return idx[:-1]
+
+
+def _scan_offsets(path):
+    offsets = array("Q")
+    with open(path, "rb") as f:
+        f.readline()  # header
+        pos = f.tell()
+        for line in iter(f.readline, b""):
+            if line.strip():
+                offsets.append(pos)
+            pos = f.tell()
+    return offsets
+
+
+class SegmentWriter:
+    """Append segments to a ``.jsonl`` store; use as a context manager."""
+
+    def __init__(self, path, meta=None, append=False):
+        self.path = Path(path)
+        self.path.parent.mkdir(parents=True, exist_ok=True)
+        if append and self.path.exists():
+            # appends go to the live file; only fresh files get the temp+rename
+            self.offsets = _read_index(self.path)
+            if self.offsets is None:
+                self.offsets = _scan_offsets(self.path)
+            self.tmp_path = None
+            self.f = open(self.path, "ab")
+        else:
+            self.offsets = array("Q")
+            self.tmp_path = temp_path_for(self.path)
+            self.f = open(self.tmp_path, "wb")
+            header = {"format": FORMAT, "version": VERSION, **(meta or {})}
+            self.f.write((_dumps({HEADER_KEY: header}) + "\n").encode("utf-8"))
+
+    def append(self, seg):
+        self.offsets.append(self.f.tell())
+        self.f.write((_dumps(seg) + "\n").encode("utf-8"))
+
+    def extend(self, segments):
+        for seg in segments:
+            self.append(seg)
+
+    def __len__(self):
+        return len(self.offsets)
+
+    def close(self):
+        if self.f.closed:
+            return
+        self.f.flush()
+        os.fsync(self.f.fileno())
+        size = self.f.tell()
+        self.f.close()
+        if self.tmp_path is not None:
+            os.replace(self.tmp_path, self.path)
+        _write_index(self.path, self.offsets, size)
+
+    def abort(self):
+        """Discard a fresh file that failed half-way (the previous file, if any, stays)."""
+        if not self.f.closed:
+            self.f.close()
+        if self.tmp_path is not None:
+            self.tmp_path.unlink(missing_ok=True)
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        if exc_type is None:
+            self.close()
+        else:
+            self.abort()
+
+
+class SegmentReader:
+    """Lazy reader: iterate, ``len()`` and index (``reader[i]``) without loading everything."""
+
+    def __init__(self, path):
+        self.path = Path(path)
+        self._legacy = None
+        self._offsets = None
+        if not self.path.exists() and self.path.with_suffix(".json").exists():
+            self.path = self.path.with_suffix(".json")
+        if self.path.suffix == ".json":
+            data = json.load(open(self.path, "r", encoding="utf-8"))
+            self._legacy = data.get("segments", [])
+            self.meta = {k: v for k, v in data.items() if k != "segments"}
+            return
+        with open(self.path, "r", encoding="utf-8") as f:
+            first = json.loads(f.readline() or "{}")
+        self.meta = {k: v for k, v in first.get(HEADER_KEY, {}).items()
+                     if k not in ("format", "version")}
+
+    @property
+    def offsets(self):
+        if self._offsets is None:
+            self._offsets = _read_index(self.path)
+            if self._offsets is None:
+                self._offsets = _scan_offsets(self.path)
+                _write_index(self.path, self._offsets, os.path.getsize(self.path))
+        return self._offsets
+
+    def __len__(self):
+        if self._legacy is not None:
+            return len(self._legacy)
+        return len(self.offsets)
+
+    def __iter__(self):
+        if self._legacy is not None:
+            yield from self._legacy
+            return
+        with open(self.path, "r", encoding="utf-8") as f:
+            f.readline()
+            for line in f:
+                if line.strip():
+                    yield json.loads(line)
+
+    def __getitem__(self, i):
+        if self._legacy is not None:
+            return self._legacy[i]
+        offsets = self.offsets
+        if i < 0:
+            i += len(offsets)
+        if not 0 <= i < len(offsets):
+            raise IndexError(i)
+        with open(self.path, "rb") as f:
+            f.seek(offsets[i])
+            return json.loads(f.readline())
+
+    def range(self, start, stop):
+        """Yield segments [start, stop) with a single seek."""
+        if self._legacy is not None:
+            yield from self._legacy[start:stop]
+            return
+        offsets = self.offsets
+        stop = min(stop, len(offsets))
+        if start >= stop:
+            return
+        with open(self.path, "rb") as f:
+            f.seek(offsets[start])
+            for _ in range(stop - start):
+                yield json.loads(f.readline())
+
+
+def write_segments(path, segments, meta=None):
+    with SegmentWriter(path, meta) as w:
+        w.extend(segments)
+
+
+def read_segments(path):
+    """Return (meta, list_of_segments); convenience for small files."""
+    r = SegmentReader(path)
+    return r.meta, list(r)
+
+
+def json_to_jsonl(src, dst=None):
+    src = Path(src)
+    dst = Path(dst) if dst else src.with_suffix(".jsonl")
+    r = SegmentReader(src)
+    write_segments(dst, r, r.meta)
+    return dst
+
+
+def jsonl_to_json(src, dst=None):
+    src = Path(src)
+    dst = Path(dst) if dst else src.with_suffix(".json")
+    r = SegmentReader(src)
+    with open(dst, "w", encoding="utf-8") as f:
+        json.dump({**r.meta, "segments": list(r)}, f, ensure_ascii=False, indent=2)
+    return dst
+
+
+def main():
+    ap = argparse.ArgumentParser(description="Convert between legacy JSON and JSONL segment files")
+    ap.add_argument("command", choices=["to-jsonl", "to-json"])
+    ap.add_argument("files", nargs="+")
+    args = ap.parse_args()
+    convert = json_to_jsonl if args.command == "to-jsonl" else jsonl_to_json
+    for src in args.files:
+        print(f"OK: {convert(src)}")
+
+
+if __name__ == "__main__":
+    main()
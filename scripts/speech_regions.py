@@ -0,0 +1,165 @@
+"""Speech-region index: one fast energy-based VAD pass over the extracted audio.
+
+``AudioExtractor`` writes ``work/audio/<stem>_speech_regions.json``::
+
+    {"sample_rate": 16000, "duration": 5400.0, "speech_duration": 3120.5,
+     "noise_floor_db": -62.1, "threshold_db": -50.3,
+     "regions": [{"start": 1.2, "end": 9.8, "mean_db": -24.0, "max_db": -11.5}, ...]}
+
+Later stages use it to touch only speech: STT transcribes the concatenated
+speech audio and maps timestamps back, alignment trims segment windows to
+speech, and F0 extraction skips silent stretches inside a segment.
+"""
+import bisect, json
+from pathlib import Path
+
+from atomic_io import atomic_open
+
+
+def detect_speech_regions(audio_path, frame_s=0.03, margin_db=10.0, min_gap_s=0.35,
+                          min_region_s=0.2, pad_s=0.15, speech_floor_db=-45.0):
+    """Stream the WAV in frames and return the speech-region index as a dict."""
+    import numpy as np
+    import soundfile as sf
+
+    info = sf.info(str(audio_path))
+    sr = info.samplerate
+    frame = max(1, int(sr * frame_s))
+    db = []
+    for block in sf.blocks(str(audio_path), blocksize=frame * 2048, dtype="float32", always_2d=True):
+        mono = block.mean(axis=1)
+        n = len(mono) // frame
+        if n:
+            frames = mono[:n * frame].reshape(n, frame)
+            db.append(10 * np.log10(np.mean(frames ** 2, axis=1) + 1e-10))
+        if len(mono) % frame:
+            tail = mono[n * frame:]
+            db.append(np.array([10 * np.log10(np.mean(tail ** 2) + 1e-10)]))
+    db = np.concatenate(db) if db else np.zeros(0)
+    duration = info.frames / sr
+
+    if len(db) == 0:
+        return {"sample_rate": sr, "duration": duration, "speech_duration": 0.0,
+                "noise_floor_db": None, "threshold_db": None, "regions": []}
+
+    # Adaptive threshold: some dB above the noise floor, but never above the
+    # level of the loud (speech) frames, and never above speech_floor_db:
+    # on content with little silence the 10th percentile is already speech,
+    # and quiet speech must not be cut out before Whisper sees it.
+    noise_floor = float(np.percentile(db, 10))
+    loud = float(np.percentile(db, 90))
+    if loud - noise_floor < margin_db:
+        # no clear gap between noise floor and speech level: keep everything
+        threshold = None
+        active = np.ones(len(db), dtype=bool)
+    else:
+        threshold = min(noise_floor + margin_db, (noise_floor + loud) / 2, speech_floor_db)
+        active = db > threshold
+
+    raw = []
+    edges = np.flatnonzero(np.diff(np.concatenate(([0], active.astype(np.int8), [0]))))
+    for s, e in zip(edges[0::2], edges[1::2]):
+        raw.append([float(s * frame_s), float(e * frame_s)])
+
+    # close short gaps, drop blips, pad
+    merged = []
+    for s, e in raw:
+        if merged and s - merged[-1][1] < min_gap_s:
+            merged[-1][1] = e
+        else:
+            merged.append([s, e])
+    regions = []
+    for s, e in merged:
+        if e - s < min_region_s:
+            continue
+        s, e = max(0.0, s - pad_s), min(duration, e + pad_s)
+        if regions and s <= regions[-1]["end"]:
+            regions[-1]["end"] = round(e, 3)
+            continue
+        regions.append({"start": round(s, 3), "end": round(e, 3)})
+    for r in regions:
+        seg = db[int(r["start"] / frame_s):max(int(r["start"] / frame_s) + 1, int(r["end"] / frame_s))]
+        r["mean_db"] = round(float(seg.mean()), 2)
+        r["max_db"] = round(float(seg.max()), 2)
+
+    return {
+        "sample_rate": sr, "duration": round(duration, 3),
+        "speech_duration": round(sum(r["end"] - r["start"] for r in regions), 3),
+        "noise_floor_db": round(noise_floor, 2),
+        "threshold_db": round(threshold, 2) if threshold is not None else None,
+        "regions": regions,
+    }
+
+
+class SpeechRegions:
+    def __init__(self, data):
+        self.data = data
+        self.regions = data.get("regions", [])
+        self.starts = [r["start"] for r in self.regions]
+        # start of each region on the compacted (speech-only) timeline
+        self.compact_starts, acc = [], 0.0
+        for r in self.regions:
+            self.compact_starts.append(acc)
+            acc += r["end"] - r["start"]
+        self.speech_duration = acc
+
+    @classmethod
+    def load(cls, path):
+        """Return the index stored at ``path``, or None if there is none."""
+        path = Path(path)
+        if not path.exists():
+            return None
+        return cls(json.load(open(path, "r", encoding="utf-8")))
+
+    def save(self, path):
+        with atomic_open(path) as f:
+            json.dump(self.data, f, ensure_ascii=False, indent=2)
+
+    @property
+    def duration(self):
+        return self.data.get("duration", 0.0)
+
+    @property
+    def speech_ratio(self):
+        return self.speech_duration / self.duration if self.duration else 0.0
+
+    def overlapping(self, start, end):
+        """Speech intervals clipped to [start, end]."""
+        i = max(0, bisect.bisect_right(self.starts, start) - 1)
+        out = []
+        for r in self.regions[i:]:
+            if r["start"] >= end:
+                break
+            s, e = max(start, r["start"]), min(end, r["end"])
+            if e > s:
+                out.append((s, e))
+        return out
+
+    def compact(self, y, sr):
+        """Concatenate the speech samples of ``y`` (a 1-D array) into one array."""
+        import numpy as np
+        chunks = [y[int(r["start"] * sr):int(r["end"] * sr)] for r in self.regions]
+        return np.concatenate(chunks) if chunks else y[:0]
+
+    def to_original(self, t):
+        """Map a time on the compacted timeline back to the original audio."""
+        if not self.regions:
+            return t
+        i = max(0, bisect.bisect_right(self.compact_starts, t) - 1)
+        r = self.regions[i]
+        return min(r["end"], r["start"] + (t - self.compact_starts[i]))
+
+    def to_original_end(self, t):
+        """Like ``to_original``, for end times: a time exactly on a region boundary
+        maps to the end of the earlier region, not past the silence gap."""
+        if not self.regions:
+            return t
+        i = max(0, bisect.bisect_left(self.compact_starts, t) - 1)
+        r = self.regions[i]
+        return min(r["end"], r["start"] + (t - self.compact_starts[i]))
+
+    def slice_speech(self, y, sr, start, end):
+        """Samples of [start, end] restricted to speech (used for F0)."""
+        import numpy as np
+        chunks = [y[int(s * sr):int(e * sr)] for s, e in self.overlapping(start, end)]
+        return np.concatenate(chunks) if chunks else y[:0]
@@ -0,0 +1,124 @@
+"""Watch-folder daemon: polls input/, queues new videos, processes them with warm models.
+
+Models stay resident between jobs through ``model_cache``, so after the
+first video each job costs inference time only. The queue lives in SQLite
+(see ``job_queue``) and survives restarts. Only one daemon may use a queue
+at a time: ``run()`` holds an exclusive lock on ``queue.lock`` next to the
+database, so a second daemon cannot requeue and re-run in-flight jobs.
+"""
+import fcntl, json, os, signal, sys, time
+from pathlib import Path
+
+from atomic_io import atomic_open
+from job_queue import JobQueue
+
+
+class WatchDaemon:
+    def __init__(self, process_fn, input_dir="input", queue=None, poll_interval=5.0,
+                 status_path="logs/queue_status.json", video_extensions=None):
+        self.process_fn = process_fn
+        self.input_dir = Path(input_dir)
+        self.queue = queue or JobQueue()
+        self.poll_interval = poll_interval
+        self.status_path = Path(status_path)
+        self.video_extensions = video_extensions or {'.mp4', '.avi', '.mov', '.mkv', '.wmv', '.flv', '.webm'}
+        # name -> (size, mtime) seen on the previous poll; a file is queued
+        # only once it is unchanged across two polls (i.e. fully copied).
+        self._pending_stat = {}
+        self._stop = False
+        self.lock_path = self.queue.db_path.with_name("queue.lock")
+        self._lock_file = None
+
+    def stop(self, *_):
+        print("\n🛑 Stop requested; finishing current job...")
+        self._stop = True
+
+    def scan(self):
+        """Enqueue videos whose size/mtime is stable; returns the number of new jobs."""
+        if not self.input_dir.exists():
+            return 0
+        seen, added = {}, 0
+        for p in self.input_dir.iterdir():
+            if not p.is_file() or p.suffix.lower() not in self.video_extensions:
+                continue
+            st = p.stat()
+            cur = (st.st_size, st.st_mtime)
+            seen[p.name] = cur
+            if self._pending_stat.get(p.name) == cur and self.queue.enqueue(p.name, *cur):
+                print(f"📥 Queued: {p.name}")
+                added += 1
+        self._pending_stat = seen
+        return added
+
+    def write_status(self, current=None):
+        status = self.queue.status()
+        status["current"] = current
+        status["updated_at"] = time.time()
+        with atomic_open(self.status_path) as f:
+            json.dump(status, f, ensure_ascii=False, indent=2)
+
+    def run_one(self):
+        """Claim and process one job; returns False when the queue is empty."""
+        job = self.queue.claim_next()
+        if job is None:
+            return False
+        self.write_status(current=job)
+        print(f"\n🚚 Job #{job['id']}: {job['video']} (attempt {job['attempts']}, "
+              f"{self.queue.depth()} more queued)")
+        t0 = time.perf_counter()
+        try:
+            ok = self.process_fn(job["video"])
+        except Exception as e:
+            ok, err = False, e
+        else:
+            err = "pipeline reported failure"
+        if ok:
+            self.queue.complete(job["id"])
+            print(f"✅ Job #{job['id']} done in {time.perf_counter() - t0:.1f}s")
+        else:
+            status = self.queue.fail(job["id"], err)
+            print(f"❌ Job #{job['id']} failed ({status})")
+        self.write_status()
+        return True
+
+    def acquire_lock(self):
+        """Take the per-queue daemon lock; returns False if another daemon holds it."""
+        f = open(self.lock_path, "a+")
+        try:
+            fcntl.flock(f, fcntl.LOCK_EX | fcntl.LOCK_NB)
+        except BlockingIOError:
+            f.close()
+            return False
+        f.seek(0)
+        f.truncate()
+        f.write(f"{os.getpid()}\n")
+        f.flush()
+        self._lock_file = f  # released when the process exits
+        return True
+
+    def run(self):
+        if not self.acquire_lock():
+            owner = self.lock_path.read_text().strip() or "?"
+            print(f"❌ Another watch daemon (pid {owner}) is already using {self.queue.db_path}; exiting")
+            sys.exit(1)
+        signal.signal(signal.SIGINT, self.stop)
+        signal.signal(signal.SIGTERM, self.stop)
+
+        recovered = self.queue.recover()
+        if recovered:
+            print(f"♻️  Requeued {recovered} interrupted job(s)")
+        print(f"👀 Watching '{self.input_dir}' every {self.poll_interval:.0f}s "
+              f"(queue: {self.queue.db_path})")
+        self.write_status()
+
+        while not self._stop:
+            self.scan()
+            while not self._stop and self.run_one():
+                pass
+            if not self._stop:
+                time.sleep(self.poll_interval)
+
+        self.write_status()
+        self.queue.close()
+        self._lock_file.close()
+        print("👋 Daemon stopped")